@@ -0,0 +1,334 @@
+import base64
+import codecs
+import hashlib
+import io
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from ollama_trace import tracer
+
+
+def get_mime_type(file_path):
+    """Determine MIME type based on file extension"""
+    extension = os.path.splitext(file_path)[1].lower()
+
+    mime_types = {
+        '.jpg': 'image/jpeg',
+        '.jpeg': 'image/jpeg',
+        '.png': 'image/png',
+        '.gif': 'image/gif',
+        '.bmp': 'image/bmp',
+        '.webp': 'image/webp',
+        '.pdf': 'application/pdf',
+        '.txt': 'text/plain'
+    }
+
+    return mime_types.get(extension, 'application/octet-stream')
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def encode_base64(stream, chunk_size=3 * 256 * 1024):
+    """Base64-encode a binary stream piecewise so the raw bytes are never held in full next to the text"""
+    parts = []
+    # Chunks are a multiple of three bytes, so no padding appears mid-stream
+    for block in iter(lambda: stream.read(chunk_size), b""):
+        parts.append(base64.b64encode(block).decode("ascii"))
+    return "".join(parts)
+
+
+class AttachmentLimitError(ValueError):
+    """A file is larger than the configured limits allow"""
+
+
+@dataclass(frozen=True)
+class AttachmentLimits:
+    """Caps on what is ingested; text files above mmap_bytes are read through a memory map"""
+    max_bytes: int = 64 * 1024 * 1024
+    max_pages: int = 1000
+    mmap_bytes: int = 4 * 1024 * 1024
+
+    def check_size(self, file_path, size):
+        if self.max_bytes and size > self.max_bytes:
+            raise AttachmentLimitError(f"{os.path.basename(file_path)} is {size / 1024 / 1024:.1f} MB; "
+                                       f"the limit is {self.max_bytes / 1024 / 1024:.0f} MB")
+
+    def check_pages(self, file_path, page_count):
+        if self.max_pages and page_count > self.max_pages:
+            raise AttachmentLimitError(f"{os.path.basename(file_path)} has {page_count} pages; "
+                                       f"the limit is {self.max_pages}")
+
+
+def read_text(file_path, limits=None, progress=None, block_size=4 * 1024 * 1024):
+    """Read a UTF-8 text file; large files are decoded straight from a memory map, block by block"""
+    limits = limits or AttachmentLimits()
+    size = os.path.getsize(file_path)
+    if size < limits.mmap_bytes:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+            return file.read()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            for start in range(0, size, block_size):
+                parts.append(decoder.decode(view[start:start + block_size]))
+                if progress:
+                    progress(min(start + block_size, size), size)
+            parts.append(decoder.decode(b"", final=True))
+        finally:
+            view.release()
+    return "".join(parts)
+
+
+@dataclass(frozen=True)
+class ImagePolicy:
+    """How images are shrunk before upload; a max_side of 0 keeps the original resolution"""
+    max_side: int = 1536
+    format: str = "JPEG"
+    quality: int = 85
+
+    def key(self):
+        return f"{self.max_side}:{self.format}:{self.quality}"
+
+
+def _encode_image(file_path, policy):
+    """Downscale and re-encode an image per the policy, falling back to the original bytes.
+
+    The original is kept when it already fits and re-encoding would not make it smaller,
+    or when Pillow is not installed.
+    """
+    if policy is not None:
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            policy = None
+    if policy is None:
+        with open(file_path, "rb") as file:
+            return encode_base64(file)
+
+    with Image.open(file_path) as image:
+        too_large = bool(policy.max_side) and max(image.size) > policy.max_side
+        if not too_large and image.format == policy.format:
+            with open(file_path, "rb") as file:
+                return encode_base64(file)
+        if too_large:
+            # Lets the JPEG decoder skip detail that the resize would throw away anyway
+            image.draft("RGB", (policy.max_side, policy.max_side))
+        image = ImageOps.exif_transpose(image)
+        if too_large:
+            image.thumbnail((policy.max_side, policy.max_side), Image.Resampling.LANCZOS)
+        if policy.format == "JPEG" and image.mode not in ("RGB", "L"):
+            if "A" in image.getbands() or "transparency" in image.info:
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            else:
+                image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, policy.format, quality=policy.quality)
+
+    if not too_large and buffer.tell() >= os.path.getsize(file_path):
+        with open(file_path, "rb") as file:
+            return encode_base64(file)
+    buffer.seek(0)
+    return encode_base64(buffer)
+
+
+def _pdf_page_count(file_path):
+    from PyPDF2 import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def _extract_pdf_pages(file_path, start, stop):
+    """Runs in a worker process: extract the text of pages [start, stop)"""
+    from PyPDF2 import PdfReader
+    reader = PdfReader(file_path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+@dataclass(frozen=True)
+class ExtractedAttachment:
+    digest: str
+    kind: str
+    pages: tuple = ()
+    image_data: str = None
+    paged: bool = False
+
+    def render(self, file_name):
+        """Format the extracted text the way it is inlined into the prompt"""
+        parts = [f"\n\n--- Content from {file_name} ---\n"]
+        if self.paged:
+            for page_num, page_text in enumerate(self.pages):
+                if page_text:
+                    parts.append(f"\n-- Page {page_num + 1} --\n{page_text}\n")
+        else:
+            parts.extend(self.pages)
+            parts.append("\n")
+        return "".join(parts)
+
+
+def _file_signature(file_path):
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class AttachmentPipeline:
+    """Extracts attachments in the background and caches the results by content hash.
+
+    Each file's progress is kept as (done, total) for the UI to poll; limits are checked on
+    every load, including cache hits, so lowering them takes effect immediately.
+    """
+
+    def __init__(self, max_workers=4, max_processes=None, pages_per_task=16, max_entries=32, limits=None):
+        self.pages_per_task = pages_per_task
+        self.max_entries = max_entries
+        self.max_processes = max_processes
+        self.limits = limits or AttachmentLimits()
+        self.progress = {}
+        self.threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="attachments")
+        self.processes = None
+        self.results = OrderedDict()
+        self.digests = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def submit(self, file_path, image_policy=None):
+        """Start extracting a file, returning a future for its ExtractedAttachment.
+
+        image_policy only applies to images; the same picture prepared for two policies is
+        cached twice.
+        """
+        if not get_mime_type(file_path).startswith('image/'):
+            image_policy = None
+        key = (file_path, image_policy)
+        signature = _file_signature(file_path)
+        with self.lock:
+            future, submitted_signature = self.pending.get(key, (None, None))
+            # A finished extraction is only reused while the file is unchanged since it was read
+            if (future is None or (future.done() and future.exception() is not None)
+                    or (future.done() and submitted_signature != signature)):
+                future = self.threads.submit(self._load, file_path, image_policy)
+                self.pending[key] = (future, signature)
+            return future
+
+    def result(self, file_path, image_policy=None):
+        future = self.submit(file_path, image_policy)
+        try:
+            return future.result()
+        finally:
+            with self.lock:
+                for key, (pending, _) in list(self.pending.items()):
+                    if pending is future:
+                        del self.pending[key]
+
+    def file_progress(self, file_path):
+        """(done, total) of the file's extraction, or None before it starts"""
+        with self.lock:
+            return self.progress.get(file_path)
+
+    def _report(self, file_path, done, total):
+        with self.lock:
+            self.progress[file_path] = (done, total)
+
+    def discard(self, file_path):
+        with self.lock:
+            keys = [key for key in self.pending if key[0] == file_path]
+            futures = [self.pending.pop(key)[0] for key in keys]
+            self.progress.pop(file_path, None)
+        for future in futures:
+            future.cancel()
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False, cancel_futures=True)
+
+    def _digest(self, file_path):
+        stat = os.stat(file_path)
+        key = (file_path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            digest = self.digests.get(key)
+        if digest is None:
+            digest = file_digest(file_path)
+            with self.lock:
+                self.digests[key] = digest
+        return digest
+
+    def _load(self, file_path, image_policy=None):
+        with tracer.span("extract", "attachments", file=os.path.basename(file_path)):
+            return self._extract(file_path, image_policy)
+
+    def _extract(self, file_path, image_policy=None):
+        limits = self.limits
+        limits.check_size(file_path, os.path.getsize(file_path))
+        digest = self._digest(file_path)
+        if image_policy is not None:
+            # The prepared image depends on the policy, so it is part of the identity
+            digest = f"{digest}@{image_policy.key()}"
+        with self.lock:
+            cached = self.results.get(digest)
+            if cached is not None:
+                self.results.move_to_end(digest)
+        if cached is not None:
+            if cached.paged:
+                limits.check_pages(file_path, len(cached.pages))
+            self._report(file_path, 1, 1)
+            return cached
+
+        mime_type = get_mime_type(file_path)
+        if mime_type.startswith('image/'):
+            self._report(file_path, 0, 1)
+            attachment = ExtractedAttachment(digest, "image", image_data=_encode_image(file_path, image_policy))
+        elif mime_type == 'text/plain':
+            text = read_text(file_path, limits, lambda done, total: self._report(file_path, done, total))
+            attachment = ExtractedAttachment(digest, "text", pages=(text,))
+        elif mime_type == 'application/pdf':
+            pages = self._extract_pdf(file_path, limits)
+            attachment = ExtractedAttachment(digest, "text", pages=tuple(pages), paged=True)
+        else:
+            raise ValueError(f"Unsupported file type: {file_path}")
+
+        with self.lock:
+            self.results[digest] = attachment
+            while len(self.results) > self.max_entries:
+                self.results.popitem(last=False)
+        self._report(file_path, 1, 1)
+        return attachment
+
+    def _extract_pdf(self, file_path, limits):
+        with self.lock:
+            if self.processes is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Forking a process that is running Qt threads is unsafe, so always spawn
+                self.processes = ProcessPoolExecutor(max_workers=self.max_processes,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            processes = self.processes
+
+        page_count = _pdf_page_count(file_path)
+        limits.check_pages(file_path, page_count)
+        self._report(file_path, 0, page_count)
+        futures = [
+            processes.submit(_extract_pdf_pages, file_path, start, min(start + self.pages_per_task, page_count))
+            for start in range(0, page_count, self.pages_per_task)
+        ]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+            self._report(file_path, len(pages), page_count)
+        return pages
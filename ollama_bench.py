@@ -0,0 +1,317 @@
+"""Measure the client's own overhead against a local mock Ollama server.
+
+    python -m ollama_bench --output bench.json
+    python -m ollama_bench --output new.json --compare bench.json
+
+Covers time to first token and end-to-end latency (streaming and not), GUI cold
+start, payload building, PDF and image preprocessing, and transcript rendering
+for large chats.
+Results are saved as JSON; --compare prints the change against an earlier run and
+exits with status 1 when a benchmark got slower than the tolerance allows.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from ollama_attachments import AttachmentPipeline, ImagePolicy
+from ollama_core import OllamaJob, OllamaJobRunner
+from ollama_mock_server import MockOllamaServer
+from ollama_transport import OllamaTransport
+
+
+def measure(function, runs, setup=None):
+    """Time function() over several runs; setup() runs untimed before each one"""
+    samples = []
+    for _ in range(runs):
+        argument = setup() if setup else None
+        started = time.perf_counter()
+        function(argument) if setup else function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summarize_samples(samples):
+    return {
+        "runs": len(samples),
+        "mean": statistics.mean(samples),
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def write_sample_pdf(path, pages, lines_per_page=40):
+    """Write a plain text PDF with the given number of pages"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(pages):
+        lines = " ".join(f"(Page {page + 1} line {line}: the quick brown fox jumps over the lazy dog.) '"
+                         for line in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {lines} ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects)))
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode()
+
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def write_sample_image(path, width, height):
+    """Write a noisy PNG, which compresses about as badly as a photo"""
+    from PyQt6.QtGui import QImage
+    data = os.urandom(width * height * 4)
+    image = QImage(data, width, height, width * 4, QImage.Format.Format_RGB32)
+    if not image.save(path):
+        raise OSError(f"Could not write {path}")
+
+
+def bench_latency(server, runs, stream, model):
+    transport = OllamaTransport(server.api_url)
+    attachments = AttachmentPipeline()
+    first_tokens = []
+    totals = []
+    try:
+        for _ in range(runs):
+            first_token = []
+            started = time.perf_counter()
+
+            def emit(kind, value):
+                if kind == "chunk" and not first_token:
+                    first_token.append(time.perf_counter())
+                elif kind == "error":
+                    raise RuntimeError(value)
+
+            job = OllamaJob(action="generate", model=model, prompt="Benchmark prompt")
+            OllamaJobRunner(job, transport, attachments, emit, stream=stream).run()
+            finished = time.perf_counter()
+            totals.append(finished - started)
+            first_tokens.append((first_token[0] if first_token else finished) - started)
+    finally:
+        attachments.shutdown()
+        transport.close()
+    return first_tokens, totals
+
+
+def bench_payload(runs, history_messages, model):
+    history = tuple(("user" if index % 2 == 0 else "assistant", f"Message {index} " + "lorem ipsum " * 40)
+                    for index in range(history_messages))
+    job = OllamaJob(action="generate", model=model, prompt="Benchmark prompt", instructions="Be brief.",
+                    history=history)
+    runner = OllamaJobRunner(job, None, None, lambda kind, value: None)
+
+    def build():
+        runner.prepare_chat().chat_body()
+
+    return measure(build, runs)
+
+
+def bench_attachment(path, runs, image_policy=None):
+    """Cold runs use a fresh pipeline each time; the warm run hits the content-hash cache"""
+    pipelines = []
+
+    def new_pipeline():
+        pipeline = AttachmentPipeline()
+        pipelines.append(pipeline)
+        return pipeline
+
+    try:
+        cold = measure(lambda pipeline: pipeline.result(path, image_policy), runs, setup=new_pipeline)
+        warm = measure(lambda: pipelines[-1].result(path, image_policy), runs)
+    finally:
+        for pipeline in pipelines:
+            pipeline.shutdown()
+    return cold, warm
+
+
+def bench_transcript(app, message_count, runs):
+    from PyQt6.QtGui import QColor
+    from ollama_transcript import TranscriptView
+
+    fill = []
+    paint = []
+    restyle = []
+    for _ in range(runs):
+        # The app trims its transcript at 5000 rows; keep every message so each case renders its full size
+        view = TranscriptView(lambda role: QColor("#0066cc"), lambda: QColor("#000000"), max_messages=message_count)
+        view.resize(800, 600)
+        view.show()
+        app.processEvents()
+
+        started = time.perf_counter()
+        for index in range(message_count):
+            role = "user" if index % 2 == 0 else "assistant"
+            view.add_message(role, f"Message {index}: " + "some words that need wrapping " * (index % 8 + 1))
+        app.processEvents()
+        fill.append(time.perf_counter() - started)
+        if view.transcript.rowCount() != message_count:
+            raise RuntimeError(f"Transcript holds {view.transcript.rowCount()} of {message_count} messages")
+
+        started = time.perf_counter()
+        view.viewport().grab()
+        paint.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        view.restyle()
+        app.processEvents()
+        view.viewport().grab()
+        restyle.append(time.perf_counter() - started)
+
+        view.close()
+        view.deleteLater()
+        app.processEvents()
+    return fill, paint, restyle
+
+
+def bench_startup(api_url, runs):
+    """Launch the GUI until its first interactive frame and collect its startup report"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ollama_client.py")
+    totals = []
+    imports = []
+    # An empty data directory on every platform, so the run neither reads nor touches the user's conversations
+    with tempfile.TemporaryDirectory() as data_dir:
+        environment = dict(os.environ, OLLAMA_UI_STARTUP_REPORT="exit", OLLAMA_ENDPOINTS=api_url,
+                           OLLAMA_UI_DATA_DIR=data_dir, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, script], env=environment, capture_output=True, text=True,
+                                    timeout=60)
+            for line in result.stderr.splitlines():
+                if line.startswith('{"startup"'):
+                    report = json.loads(line)["startup"]
+                    totals.append(report["total_ms"] / 1000)
+                    imports.append(report["phases_ms"]["imports"] / 1000)
+                    break
+            else:
+                raise RuntimeError(f"No startup report from the client:\n{result.stderr}")
+    return totals, imports
+
+
+def run_benchmarks(args):
+    results = {}
+
+    def record(name, samples):
+        results[name] = summarize_samples(samples)
+        print(f"{name:40} median {results[name]['median'] * 1000:10.2f} ms  ({len(samples)} runs)", file=sys.stderr)
+
+    with MockOllamaServer(latency=args.latency, token_rate=args.token_rate, tokens=args.tokens) as server:
+        model = server.models[0]
+        first_tokens, totals = bench_latency(server, args.runs, True, model)
+        record("stream.ttft", first_tokens)
+        record("stream.total", totals)
+        _, totals = bench_latency(server, args.runs, False, model)
+        record("nostream.total", totals)
+        totals, imports = bench_startup(server.api_url, args.runs)
+        record("startup.interactive", totals)
+        record("startup.imports", imports)
+
+    record(f"payload.build_{args.history}", bench_payload(args.runs, args.history, model))
+
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = args.pdf or os.path.join(directory, "sample.pdf")
+        if not args.pdf:
+            write_sample_pdf(pdf_path, args.pdf_pages)
+        try:
+            cold, warm = bench_attachment(pdf_path, args.runs)
+        except ImportError:
+            print("PyPDF2 is not installed; skipping the PDF benchmark", file=sys.stderr)
+        else:
+            record("attachment.pdf_cold", cold)
+            record("attachment.pdf_warm", warm)
+
+        image_path = args.image or os.path.join(directory, "sample.png")
+        if not args.image:
+            write_sample_image(image_path, args.image_size, args.image_size)
+        cold, warm = bench_attachment(image_path, args.runs)
+        record("attachment.image_cold", cold)
+        record("attachment.image_warm", warm)
+        cold, _ = bench_attachment(image_path, args.runs, ImagePolicy())
+        record("attachment.image_downscale_cold", cold)
+
+    for count in args.transcript_sizes:
+        fill, paint, restyle = bench_transcript(app, count, max(1, args.runs // 2))
+        record(f"transcript.fill_{count}", fill)
+        record(f"transcript.paint_{count}", paint)
+        record(f"transcript.restyle_{count}", restyle)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of each median against the baseline and return the names that regressed"""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("median"):
+            print(f"{name:40} new")
+            continue
+        change = result["median"] / previous["median"] - 1
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:40} {previous['median'] * 1000:10.2f} ms -> {result['median'] * 1000:10.2f} ms  {change:+7.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m ollama_bench", description="Benchmark the client against a mock Ollama server.")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a benchmark counts as regressed")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="mock server tokens per second (0 = unthrottled)")
+    parser.add_argument("--tokens", type=int, default=256, help="tokens per mock response")
+    parser.add_argument("--history", type=int, default=200, help="history messages for the payload benchmark")
+    parser.add_argument("--pdf", help="PDF to preprocess instead of a generated one")
+    parser.add_argument("--pdf-pages", type=int, default=200)
+    parser.add_argument("--image", help="image to preprocess instead of a generated one")
+    parser.add_argument("--image-size", type=int, default=3000, help="side of the generated square image in pixels")
+    parser.add_argument("--transcript-sizes", type=int, nargs="+", default=[1000, 10000])
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file).get("results", {})
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used_at);
+"""
+
+
+def request_key(model, message_fragments, options=None, attachment_digests=()):
+    """Hash everything that determines a model's answer.
+
+    message_fragments are the serialized messages without image data, which is represented
+    by the attachment digests instead of being hashed again in full.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"model": model, "options": options or {}, "attachments": list(attachment_digests)},
+                             sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    for fragment in message_fragments:
+        digest.update(b"\n")
+        digest.update(fragment)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Persistent LRU cache of complete answers, bounded by entry count and total size"""
+
+    def __init__(self, path, max_entries=1000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.entries, self.total_bytes = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self.connection:
+                self.connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def put(self, key, model, response):
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            with self.connection:
+                previous = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                if previous is not None:
+                    self.entries -= 1
+                    self.total_bytes -= previous[0]
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, response, size, used_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, model, response, size, time.time()))
+                self.entries += 1
+                self.total_bytes += size
+                self._evict()
+
+    def clear(self):
+        with self.lock:
+            with self.connection:
+                self.connection.execute("DELETE FROM responses")
+            self.entries = 0
+            self.total_bytes = 0
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def _evict(self):
+        while self.entries > self.max_entries or self.total_bytes > self.max_bytes:
+            row = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY used_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self.entries -= 1
+            self.total_bytes -= row[1]
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import time
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+class ModelCatalog:
+    """Installed models and their metadata, cached on disk so the list shows before the server answers"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.models = {}
+        self.fetched_at = None
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            self.models = data.get("models", {})
+            self.fetched_at = data.get("fetched_at")
+        except (OSError, ValueError):
+            pass
+
+    def names(self):
+        with self.lock:
+            return sorted(self.models)
+
+    def info(self, name):
+        with self.lock:
+            return dict(self.models.get(name, {}))
+
+    def context_length(self, name):
+        return self.info(name).get("context_length")
+
+    def update_from_tags(self, tag_models):
+        """Replace the catalog with an /api/tags listing.
+
+        Returns the names whose digest changed (or that are new), which are the only ones
+        that need a fresh /api/show round trip.
+        """
+        changed = []
+        with self.lock:
+            models = {}
+            for model in tag_models:
+                name = model["name"]
+                previous = self.models.get(name, {})
+                details = model.get("details") or {}
+                entry = {
+                    "digest": model.get("digest"),
+                    "modified_at": model.get("modified_at"),
+                    "size": model.get("size"),
+                    "family": details.get("family"),
+                    "parameter_size": details.get("parameter_size"),
+                    "quantization_level": details.get("quantization_level"),
+                    "context_length": None,
+                }
+                if previous.get("digest") == entry["digest"] and previous.get("shown"):
+                    entry["context_length"] = previous.get("context_length")
+                    entry["shown"] = True
+                else:
+                    changed.append(name)
+                models[name] = entry
+            self.models = models
+            self.fetched_at = time.time()
+        return changed
+
+    def apply_show(self, name, show):
+        """Record the details from an /api/show response"""
+        model_info = show.get("model_info") or {}
+        context_length = None
+        for key, value in model_info.items():
+            if key.endswith(".context_length"):
+                context_length = value
+                break
+        details = show.get("details") or {}
+        with self.lock:
+            entry = self.models.get(name)
+            if entry is None:
+                return
+            entry["context_length"] = context_length
+            entry["parameter_size"] = details.get("parameter_size") or entry.get("parameter_size")
+            entry["quantization_level"] = details.get("quantization_level") or entry.get("quantization_level")
+            entry["shown"] = True
+
+    def describe(self, name):
+        info = self.info(name)
+        parts = [part for part in (info.get("family"), info.get("parameter_size"), info.get("quantization_level")) if part]
+        if info.get("size"):
+            parts.append(format_size(info["size"]))
+        if info.get("context_length"):
+            parts.append(f"{info['context_length']} token context")
+        return " · ".join(parts)
+
+    def save(self):
+        with self.lock:
+            data = {"fetched_at": self.fetched_at, "models": self.models}
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,245 @@
+"""Run prompts against Ollama models without the GUI.
+
+    python -m ollama_cli prompts.jsonl --model llama3 --model mistral --concurrency 4
+
+Each line of the prompts file is a JSON object with a "prompt" and optionally "id",
+"model", "instructions", "files" (paths) and "history" (a list of {"role", "content"}).
+Prompts without a "model" run against every --model. Results are written to stdout as
+they complete and a latency/throughput summary goes to stderr.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ollama_attachments import AttachmentLimits, AttachmentPipeline
+from ollama_context import estimate_tokens
+from ollama_core import OllamaJob, OllamaJobRunner
+from ollama_endpoints import EndpointPool, normalize_api_url
+from ollama_trace import profiled, tracer
+from ollama_transport import DEFAULT_API_URL, OllamaTransport
+
+
+class PromptFileError(ValueError):
+    """The prompts file is missing or a line in it is not a valid prompt"""
+
+
+def load_prompts(path, models):
+    """Yield (line_number, record, job) per prompt and model; raises PromptFileError as path:line: message"""
+    try:
+        stream = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    except OSError as e:
+        raise PromptFileError(f"{path}: {e.strerror or e}")
+    with stream:
+        line_number = 0
+        try:
+            for line_number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise PromptFileError(f"{path}:{line_number}: invalid JSON: {e}")
+                if not isinstance(record, dict) or "prompt" not in record:
+                    raise PromptFileError(f"{path}:{line_number}: missing \"prompt\"")
+                try:
+                    history = tuple((msg["role"], msg["content"]) for msg in record.get("history", ()))
+                except (KeyError, TypeError):
+                    raise PromptFileError(f"{path}:{line_number}: \"history\" entries need a \"role\" and \"content\"")
+                for model in ([record["model"]] if record.get("model") else models):
+                    yield line_number, record, OllamaJob(
+                        action="generate",
+                        model=model,
+                        prompt=record["prompt"],
+                        instructions=record.get("instructions"),
+                        files=tuple(record.get("files", ())),
+                        history=history,
+                    )
+        except (OSError, UnicodeDecodeError) as e:
+            raise PromptFileError(f"{path}:{line_number + 1}: {e}")
+
+
+class PromptRun:
+    """Collects the events of one job and times them"""
+
+    def __init__(self, record_id, job, on_chunk=None):
+        self.record_id = record_id
+        self.job = job
+        self.on_chunk = on_chunk
+        self.response = None
+        self.error = None
+        self.stats = {}
+        self.timings = {}
+        self.skipped = []
+        self.started = None
+        self.first_token = None
+        self.finished = None
+
+    def emit(self, kind, value):
+        if kind == "chunk":
+            if self.first_token is None:
+                self.first_token = time.perf_counter()
+            if self.on_chunk:
+                self.on_chunk(value)
+        elif kind == "response":
+            self.response = value
+        elif kind == "error":
+            self.error = value
+        elif kind == "stats":
+            self.stats = value
+        elif kind == "timings":
+            self.timings = {key: round(value, 4) for key, value in value.items()}
+        elif kind == "skipped":
+            self.skipped = [{"file": file_path, "error": message} for file_path, message in value]
+
+    def result(self):
+        latency = self.finished - self.started
+        tokens = self.stats.get("eval_count") or estimate_tokens(self.response or "")
+        generating = self.finished - (self.first_token or self.started)
+        return {
+            "id": self.record_id,
+            "model": self.job.model,
+            "prompt": self.job.prompt,
+            "response": self.response,
+            "error": self.error,
+            "skipped_files": self.skipped,
+            "latency_s": round(latency, 4),
+            "ttft_s": round(self.first_token - self.started, 4) if self.first_token else None,
+            "tokens": tokens,
+            "tokens_per_s": round(tokens / generating, 2) if self.response and generating > 0 else None,
+            "server": self.stats,
+            "client": self.timings,
+        }
+
+
+def run_prompt(run, transport, attachments, stream):
+    runner = OllamaJobRunner(run.job, transport, attachments, run.emit, stream=stream)
+    run.started = time.perf_counter()
+    with tracer.span("prompt", "job", id=run.record_id, model=run.job.model, job_id=run.job.job_id):
+        runner.run()
+    run.finished = time.perf_counter()
+    return run
+
+
+def summarize(results, wall_time):
+    latencies = sorted(result["latency_s"] for result in results if not result["error"])
+    tokens = sum(result["tokens"] or 0 for result in results if not result["error"])
+    failed = sum(1 for result in results if result["error"])
+    lines = [f"{len(results)} requests ({failed} failed) in {wall_time:.2f}s, "
+             f"{len(results) / wall_time:.2f} requests/s, {tokens / wall_time:.1f} tokens/s overall"]
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        lines.append(f"latency mean {statistics.mean(latencies):.3f}s, p50 {statistics.median(latencies):.3f}s, "
+                     f"p95 {p95:.3f}s, max {latencies[-1]:.3f}s")
+    return "\n".join(lines)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m ollama_cli", description="Run a JSONL file of prompts against Ollama models.")
+    parser.add_argument("prompts", help="JSONL file of prompts, or - for stdin")
+    parser.add_argument("-m", "--model", action="append", default=[], help="model to run each prompt against (repeatable)")
+    parser.add_argument("-c", "--concurrency", type=int, default=1, help="number of requests in flight")
+    parser.add_argument("--api-url", action="append", default=[],
+                        help=f"Ollama API base URL (default {DEFAULT_API_URL}); repeat to spread requests over several servers")
+    parser.add_argument("--format", choices=("jsonl", "text"), default="jsonl", help="output format")
+    parser.add_argument("--no-stream", action="store_true", help="ask the server for complete responses")
+    parser.add_argument("--max-file-mb", type=float, default=AttachmentLimits.max_bytes / 1024 / 1024,
+                        help="skip attached files larger than this")
+    parser.add_argument("--max-pages", type=int, default=AttachmentLimits.max_pages,
+                        help="skip attached PDFs with more pages than this")
+    parser.add_argument("--trace", default=os.environ.get("OLLAMA_UI_TRACE"), metavar="PATH",
+                        help="write a Chrome/Perfetto trace of every request to PATH")
+    parser.add_argument("--profile", default=os.environ.get("OLLAMA_UI_PROFILE"), metavar="PATH",
+                        help="run under cProfile (main thread only) and write the stats to PATH")
+    parser.add_argument("--connect-timeout", type=float, default=5.0)
+    parser.add_argument("--read-timeout", type=float, default=300.0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace:
+        tracer.enable()
+    try:
+        with profiled(args.profile):
+            return run_prompts(args)
+    finally:
+        if args.trace:
+            tracer.save(args.trace)
+
+
+def run_prompts(args):
+    stream = not args.no_stream
+    api_urls = [normalize_api_url(url) for url in args.api_url] or [DEFAULT_API_URL]
+    transport_options = dict(connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                             pool_size=max(args.concurrency, 1))
+    if len(api_urls) > 1:
+        transport = EndpointPool(api_urls, **transport_options)
+        # Fills the routing table so each prompt goes to a server that has its model
+        transport.list_models()
+    else:
+        transport = OllamaTransport(api_urls[0], **transport_options)
+    attachments = AttachmentPipeline(limits=AttachmentLimits(max_bytes=int(args.max_file_mb * 1024 * 1024),
+                                                             max_pages=args.max_pages))
+    output_lock = threading.Lock()
+    # Chunks can only be echoed live when a single request is in flight
+    live_text = args.format == "text" and args.concurrency == 1
+
+    def write_chunk(chunk):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+
+    def write_result(result):
+        with output_lock:
+            if args.format == "jsonl":
+                sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            else:
+                if not live_text:
+                    sys.stdout.write(f"=== [{result['id']}] {result['model']} ===\n{result['response'] or ''}")
+                sys.stdout.write(f"\n--- {result['error'] or 'ok'}: {result['latency_s']}s, "
+                                 f"{result['tokens_per_s'] or '-'} tokens/s ---\n\n")
+            sys.stdout.flush()
+
+    try:
+        runs = []
+        try:
+            for line_number, record, job in load_prompts(args.prompts, args.model):
+                runs.append(PromptRun(record.get("id", line_number), job, write_chunk if live_text else None))
+        except PromptFileError as e:
+            print(e, file=sys.stderr)
+            return 2
+        if not runs:
+            print("No prompts to run (give --model for prompts without a \"model\").", file=sys.stderr)
+            return 2
+
+        results = []
+        started = time.perf_counter()
+        if live_text:
+            for run in runs:
+                sys.stdout.write(f"=== [{run.record_id}] {run.job.model} ===\n")
+                result = run_prompt(run, transport, attachments, stream).result()
+                results.append(result)
+                write_result(result)
+        else:
+            with ThreadPoolExecutor(max_workers=max(args.concurrency, 1)) as executor:
+                futures = [executor.submit(run_prompt, run, transport, attachments, stream) for run in runs]
+                for future in as_completed(futures):
+                    result = future.result().result()
+                    results.append(result)
+                    write_result(result)
+        print(summarize(results, time.perf_counter() - started), file=sys.stderr)
+        return 1 if any(result["error"] for result in results) else 0
+    finally:
+        attachments.shutdown()
+        transport.close()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,213 +1,260 @@
+import time
+
+# Taken before the other imports so the startup report includes them
+PROCESS_STARTED = time.perf_counter()
+
 import sys
-import json
-import requests
-import base64
 import os
+import json
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QComboBox, 
                              QTextEdit, QPushButton, QVBoxLayout, 
                              QHBoxLayout, QWidget, QLabel, QSplitter,
-                             QTabWidget, QGroupBox, QFileDialog, QListWidget)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QRect, QPoint
-from PyQt6.QtGui import QTextCursor, QColor, QTextCharFormat, QPalette
-from PyPDF2 import PdfReader
+                             QTabWidget, QGroupBox, QFileDialog, QListWidget,
+                             QSpinBox, QCheckBox, QLineEdit, QListWidgetItem,
+                             QAbstractItemView, QInputDialog)
+from PyQt6.QtCore import (Qt, QObject, QRunnable, QThreadPool, QTimer,
+                          QStandardPaths, pyqtSignal, QRect, QPoint)
+from PyQt6.QtGui import QColor, QPalette
+from ollama_attachments import AttachmentLimits, AttachmentPipeline, ImagePolicy, get_mime_type
+from ollama_cache import ResponseCache
+from ollama_catalog import ModelCatalog
+from ollama_context import ContextWindow
+from ollama_core import OllamaJob, OllamaJobRunner
+from ollama_endpoints import EndpointPool, load_endpoint_urls, normalize_api_url, save_endpoint_urls
+from ollama_metrics import MetricsHistory, StartupTimer, build_entry, format_readout
+from ollama_retrieval import DEFAULT_EMBED_MODEL, DocumentIndex, RetrievalSettings
+from ollama_store import ConversationStore
+from ollama_transcript import TranscriptView
+from ollama_trace import option_value, profiled, traced, tracer
+from ollama_transport import OllamaTransport
+
+
+HISTORY_PAGE_SIZE = 50
 
 
-class OllamaAPIThread(QThread):
-    response_received = pyqtSignal(str)
-    models_received = pyqtSignal(list)
-    error_occurred = pyqtSignal(str)
+def app_data_path(file_name):
+    """Path of a file in the per-user application data directory, or in OLLAMA_UI_DATA_DIR when set"""
+    directory = (os.environ.get("OLLAMA_UI_DATA_DIR")
+                 or QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, file_name)
+
+
+class OllamaJobSignals(QObject):
+    job_event = pyqtSignal(int, str, object)
+    finished = pyqtSignal(int)
+
+
+class OllamaWorker(QRunnable):
+    """Runs an OllamaJobRunner on the thread pool and forwards its events as queued signals"""
     
-    def __init__(self, api_url="http://localhost:11434/api"):
+    def __init__(self, job, signals, **runner_options):
         super().__init__()
-        self.api_url = api_url
-        self.action = None
-        self.model = None
-        self.prompt = None
-        self.instructions = None
-        self.files = []
-        self.chat_history = []
-        
+        self.setAutoDelete(False)
+        self.job = job
+        self.signals = signals
+        self.runner = OllamaJobRunner(job, emit=self._emit, **runner_options)
+        self.cancel_event = self.runner.cancel_event
+        self.submitted = time.perf_counter()
+    
+    def cancel(self):
+        self.runner.cancel()
+    
     def run(self):
+        tracer.complete("queued", self.submitted, time.perf_counter(), "job", job_id=self.job.job_id)
         try:
-            if self.action == "generate":
-                self._generate_response()
-            elif self.action == "list_models":
-                self._list_models()
-        except Exception as e:
-            self.error_occurred.emit(f"Error: {str(e)}")
+            with tracer.span(f"job {self.job.action}", "job", job_id=self.job.job_id, model=self.job.model):
+                self.runner.run()
+        finally:
+            self.signals.finished.emit(self.job.job_id)
     
-    def _generate_response(self):
-        url = f"{self.api_url}/chat"
-        
-        messages = []
-        
-        if self.instructions and self.instructions.strip():
-            messages.append({"role": "system", "content": self.instructions})
-        
-        if self.chat_history:
-            messages.extend(self.chat_history)
-        
-        messages.append({"role": "user", "content": self.prompt})
-        
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "stream": False,
-            "options": {}
-        }
-        
-        if self.instructions and self.instructions.strip():
-            payload["options"]["system"] = self.instructions
-        
-        if self.files:
-            images = []
-            text_content = ""
-            
-            for file_path in self.files:
-                try:
-                    mime_type = self._get_mime_type(file_path)
-                    
-                    if mime_type.startswith('image/'):
-                        with open(file_path, "rb") as file:
-                            file_content = file.read()
-                            base64_content = base64.b64encode(file_content).decode('utf-8')
-                            images.append(base64_content)
-                    
-                    elif mime_type == 'text/plain':
-                        with open(file_path, "r") as file:
-                            file_text = file.read()
-                            file_name = os.path.basename(file_path)
-                            text_content += f"\n\n--- Content from {file_name} ---\n{file_text}\n"
-                    
-                    elif mime_type == 'application/pdf':
-                        try:
-                            reader = PdfReader(file_path)
-                            file_name = os.path.basename(file_path)
-                            text_content += f"\n\n--- Content from {file_name} ---\n"
-                            
-                            for page_num, page in enumerate(reader.pages):
-                                page_text = page.extract_text()
-                                if page_text:
-                                    text_content += f"\n-- Page {page_num + 1} --\n{page_text}\n"
-                        except ImportError:
-                            self.error_occurred.emit("PyPDF2 not installed. Please install it to process PDF files: pip install PyPDF2")
-                            return
-                    
-                except Exception as e:
-                    self.error_occurred.emit(f"Error processing file {file_path}: {str(e)}")
-                    return
-            
-            if images:
-                payload["images"] = images
-            
-            if text_content:
-                if messages:
-                    messages[-1]["content"] += f"\n{text_content}"
-        
-        response = requests.post(url, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            response_content = data.get("message", {}).get("content", "No response")
-            
-            self.chat_history.append({"role": "user", "content": self.prompt})
-            self.chat_history.append({"role": "assistant", "content": response_content})
-            
-            self.response_received.emit(response_content)
-        else:
-            try:
-                self._fallback_generate()
-            except Exception as e:
-                self.error_occurred.emit(f"API Error: {response.status_code} - {response.text}")
+    def _emit(self, kind, value):
+        self.signals.job_event.emit(self.job.job_id, kind, value)
+
+
+class OllamaScheduler(QObject):
+    """Runs jobs on a bounded thread pool and routes each job's results to its own handlers"""
     
-    def _fallback_generate(self):
-        """Fallback to the generate endpoint if chat endpoint is not available"""
-        url = f"{self.api_url}/generate"
-        
-        context_prompt = ""
-        
-        if self.instructions and self.instructions.strip():
-            context_prompt = f"System: {self.instructions}\n\n"
+    def __init__(self, transport=None, max_workers=4, stream=True, response_cache=None, catalog=None,
+                 document_index=None, parent=None):
+        super().__init__(parent)
+        self.transport = transport or OllamaTransport()
+        self.retired_transports = []
+        self.response_cache = response_cache
+        self.catalog = catalog
+        self.document_index = document_index
+        self.attachments = AttachmentPipeline()
+        self.stream = stream
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self.signals = OllamaJobSignals(self)
+        self.jobs = {}
         
-        for msg in self.chat_history:
-            prefix = "User: " if msg["role"] == "user" else "Assistant: "
-            context_prompt += f"{prefix}{msg['content']}\n\n"
-
-        if self.instructions and self.instructions.strip():
-            context_prompt += f"IMPORTANT INSTRUCTION: {self.instructions}\n\n"
-            
-        context_prompt += f"User: {self.prompt}\n\nAssistant:"
-        
-        payload = {
-            "model": self.model,
-            "prompt": context_prompt,
-            "stream": False,
-            "options": {}
-        }
-        
-        if self.instructions and self.instructions.strip():
-            payload["options"]["system"] = self.instructions
-        
-        response = requests.post(url, json=payload)
-        if response.status_code == 200:
-            data = response.json()
-            response_content = data.get("response", "No response")
-            
-            self.chat_history.append({"role": "user", "content": self.prompt})
-            self.chat_history.append({"role": "assistant", "content": response_content})
-            
-            self.response_received.emit(response_content)
-        else:
-            self.error_occurred.emit(f"API Error: {response.status_code} - {response.text}")
-    
-    def _list_models(self):
-        url = f"{self.api_url}/tags"
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            models = [model["name"] for model in data.get("models", [])]
-            self.models_received.emit(models)
-        else:
-            self.error_occurred.emit(f"Failed to fetch models: {response.status_code} - {response.text}")
-    
-    def _get_mime_type(self, file_path):
-        """Determine MIME type based on file extension"""
-        extension = os.path.splitext(file_path)[1].lower()
-        
-        mime_types = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.bmp': 'image/bmp',
-            '.webp': 'image/webp',
-            '.pdf': 'application/pdf',
-            '.txt': 'text/plain'
-        }
-        
-        return mime_types.get(extension, 'application/octet-stream')
+        self.signals.job_event.connect(self._dispatch)
+        self.signals.finished.connect(self._finish)
+    
+    def submit(self, job, **handlers):
+        """Queue a job; handlers are on_<kind> callables taking (job, value), e.g. on_response or on_chunk"""
+        handlers = {name[len("on_"):]: handler for name, handler in handlers.items()}
+        worker = OllamaWorker(job, self.signals, transport=self.transport, attachments=self.attachments,
+                              stream=self.stream, response_cache=self.response_cache, catalog=self.catalog,
+                              document_index=self.document_index)
+        self.jobs[job.job_id] = (job, worker, handlers)
+        self.pool.start(worker)
+        return job.job_id
+    
+    def replace_transport(self, transport):
+        """Send new jobs through another transport; the old one is closed once its jobs finish"""
+        self.retired_transports.append(self.transport)
+        self.transport = transport
+        self._close_retired_transports()
+    
+    def _close_retired_transports(self):
+        in_use = {id(worker.runner.transport) for job, worker, handlers in self.jobs.values()}
+        for transport in [transport for transport in self.retired_transports if id(transport) not in in_use]:
+            self.retired_transports.remove(transport)
+            transport.close()
+    
+    def cancel(self, job_id):
+        entry = self.jobs.get(job_id)
+        if entry is None:
+            return
+        job, worker, handlers = entry
+        worker.cancel()
+        if self.pool.tryTake(worker):
+            self._dispatch(job_id, "error", "Request cancelled before it started.")
+            self._finish(job_id)
+    
+    def is_cancelled(self, job_id):
+        entry = self.jobs.get(job_id)
+        return entry is not None and entry[1].cancel_event.is_set()
+    
+    def is_running(self, job_id):
+        return job_id in self.jobs
+    
+    def shutdown(self, timeout_ms=3000):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        # Closing the transport aborts requests still waiting on the server, which
+        # cancelling alone cannot interrupt
+        self.transport.close()
+        for transport in self.retired_transports:
+            transport.close()
+        self.retired_transports.clear()
+        self.attachments.shutdown()
+        self.pool.waitForDone(timeout_ms)
+        if self.response_cache is not None:
+            self.response_cache.close()
+    
+    def _dispatch(self, job_id, kind, value):
+        entry = self.jobs.get(job_id)
+        if entry is None:
+            return
+        job, worker, handlers = entry
+        handler = handlers.get(kind)
+        if handler:
+            handler(job, value)
+    
+    def _finish(self, job_id):
+        self.jobs.pop(job_id, None)
+        if self.retired_transports:
+            self._close_retired_transports()
 
 
 class OllamaClientApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup=None, startup_report=""):
         super().__init__()
-        self.api_thread = OllamaAPIThread()
+        self.startup = startup
+        self.startup_report = startup_report
+        self.startup_scheduled = False
+        # Files, databases and the server are only touched once the window is on screen
+        self.catalog = None
+        self.scheduler = None
+        self.store = None
+        self.metrics = None
+        self.context = ContextWindow()
+        self.generation_metrics = None
+        self.compare_window = None
+        self.session_id = None
+        self.oldest_loaded_id = None
+        self.history_exhausted = True
+        self.generation_job_id = None
+        self.models_job_id = None
+        self.summary_job_id = None
+        self.preload_job_id = None
+        self.generate_context = None
+        self.cache_tag = ""
+        self.retrieval_note = ""
         self.file_paths = []
+        self.file_futures = {}
+        self.image_sides = {}
+        self.stream_buffer = []
+        self.streaming_message = None
+        self.stream_timer = QTimer(self)
+        self.stream_timer.setSingleShot(True)
+        self.stream_timer.setInterval(50)
+        self.preload_timer = QTimer(self)
+        self.preload_timer.setSingleShot(True)
+        self.preload_timer.setInterval(500)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.ingest_timer = QTimer(self)
+        self.ingest_timer.setInterval(100)
         self.init_ui()
         self.setup_connections()
-        self.load_models()
         self.center_on_screen()
         
     def center_on_screen(self):
         """Center the window on the screen"""
-        screen = QApplication.primaryScreen().geometry()
+        screen = QApplication.primaryScreen().availableGeometry()
         window_size = self.geometry()
-        x = (screen.width() - window_size.width()) // 2
-        y = (screen.height() - window_size.height()) // 2
+        x = screen.x() + (screen.width() - window_size.width()) // 2
+        y = screen.y() + (screen.height() - window_size.height()) // 2
         self.move(x, y)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.startup_scheduled:
+            self.startup_scheduled = True
+            QTimer.singleShot(0, self.finish_startup)
+    
+    def finish_startup(self):
+        """Open the stores and start loading models, after the first frame is up"""
+        self.mark_startup("first frame")
+        self.catalog = ModelCatalog(app_data_path("models.json"))
+        self.scheduler = OllamaScheduler(transport=self.create_endpoint_pool(load_endpoint_urls(app_data_path("endpoints.json"))),
+                                         response_cache=ResponseCache(app_data_path("response_cache.db")),
+                                         catalog=self.catalog,
+                                         document_index=DocumentIndex(app_data_path("retrieval")),
+                                         parent=self)
+        self.scheduler.attachments.limits = self.attachment_limits()
+        self.store = ConversationStore(app_data_path("conversations.db"))
+        self.metrics = MetricsHistory(app_data_path("metrics.json"))
+        self.refresh_sessions()
+        self.show_cached_models()
+        self.load_models()
+        self.mark_startup("stores and cached models")
+        QTimer.singleShot(0, self.report_startup)
+    
+    def mark_startup(self, name):
+        if self.startup is not None:
+            self.startup.mark(name)
+    
+    def report_startup(self):
+        """Runs once the event loop is idle after startup, i.e. at the first interactive frame"""
+        if self.startup is None:
+            return
+        self.mark_startup("interactive")
+        self.statusBar().showMessage(f"Ready in {self.startup.total_ms():.0f} ms", 5000)
+        if self.startup_report:
+            print(json.dumps({"startup": self.startup.report()}), file=sys.stderr, flush=True)
+            if self.startup_report == "exit":
+                self.close()
         
     def init_ui(self):
         self.setWindowTitle("Ollama Chat Client")
-        self.setGeometry(100, 100, 900, 700)
+        self.resize(900, 700)
         
         main_widget = QWidget()
         main_layout = QVBoxLayout()
@@ -221,6 +268,25 @@ class OllamaClientApp(QMainWindow):
         model_layout.addWidget(self.refresh_btn)
         self.clear_chat_btn = QPushButton("Clear Chat")
         model_layout.addWidget(self.clear_chat_btn)
+        self.compare_btn = QPushButton("Compare Models...")
+        model_layout.addWidget(self.compare_btn)
+        self.servers_btn = QPushButton("Servers...")
+        model_layout.addWidget(self.servers_btn)
+        model_layout.addWidget(QLabel("Context tokens:"))
+        self.context_budget_spin = QSpinBox()
+        self.context_budget_spin.setRange(512, 1048576)
+        self.context_budget_spin.setSingleStep(512)
+        self.context_budget_spin.setValue(self.context.default_budget)
+        model_layout.addWidget(self.context_budget_spin)
+        self.summarize_check = QCheckBox("Summarize old turns")
+        model_layout.addWidget(self.summarize_check)
+        model_layout.addWidget(QLabel("Keep loaded:"))
+        self.keep_alive_combo = QComboBox()
+        for label, keep_alive in (("5 minutes", "5m"), ("30 minutes", "30m"), ("2 hours", "2h"),
+                                  ("Forever", "-1m"), ("Unload after reply", "0")):
+            self.keep_alive_combo.addItem(label, keep_alive)
+        self.keep_alive_combo.setCurrentIndex(1)
+        model_layout.addWidget(self.keep_alive_combo)
         model_layout.addStretch()
         main_layout.addLayout(model_layout)
         
@@ -247,8 +313,62 @@ class OllamaClientApp(QMainWindow):
         file_buttons_layout.addWidget(self.add_file_btn)
         file_buttons_layout.addWidget(self.clear_files_btn)
         file_buttons_layout.addStretch()
+        file_buttons_layout.addWidget(QLabel("Max image side:"))
+        self.image_side_spin = QSpinBox()
+        self.image_side_spin.setRange(0, 8192)
+        self.image_side_spin.setSingleStep(256)
+        self.image_side_spin.setSuffix(" px")
+        self.image_side_spin.setSpecialValueText("Original")
+        self.image_side_spin.setValue(ImagePolicy.max_side)
+        self.image_side_spin.setToolTip("Images are downscaled to this size before upload (per model)")
+        file_buttons_layout.addWidget(self.image_side_spin)
+        self.image_format_combo = QComboBox()
+        for label, image_format in (("JPEG", "JPEG"), ("WebP", "WEBP"), ("PNG", "PNG")):
+            self.image_format_combo.addItem(label, image_format)
+        file_buttons_layout.addWidget(self.image_format_combo)
+        file_buttons_layout.addWidget(QLabel("Quality:"))
+        self.image_quality_spin = QSpinBox()
+        self.image_quality_spin.setRange(10, 100)
+        self.image_quality_spin.setValue(ImagePolicy.quality)
+        file_buttons_layout.addWidget(self.image_quality_spin)
         file_layout.addLayout(file_buttons_layout)
         
+        retrieval_layout = QHBoxLayout()
+        self.retrieval_check = QCheckBox("Retrieval mode")
+        self.retrieval_check.setToolTip("Send only the document passages most relevant to each message instead of "
+                                        "the full text")
+        retrieval_layout.addWidget(self.retrieval_check)
+        retrieval_layout.addWidget(QLabel("Embedding model:"))
+        self.embed_model_combo = QComboBox()
+        self.embed_model_combo.setEditable(True)
+        self.embed_model_combo.addItem(DEFAULT_EMBED_MODEL)
+        self.embed_model_combo.setMinimumWidth(160)
+        retrieval_layout.addWidget(self.embed_model_combo)
+        retrieval_layout.addWidget(QLabel("Passages:"))
+        self.top_k_spin = QSpinBox()
+        self.top_k_spin.setRange(1, 50)
+        self.top_k_spin.setValue(RetrievalSettings.top_k)
+        retrieval_layout.addWidget(self.top_k_spin)
+        retrieval_layout.addStretch()
+        file_layout.addLayout(retrieval_layout)
+        
+        limits_layout = QHBoxLayout()
+        limits_layout.addWidget(QLabel("Max file size:"))
+        self.max_file_spin = QSpinBox()
+        self.max_file_spin.setRange(1, 4096)
+        self.max_file_spin.setSuffix(" MB")
+        self.max_file_spin.setValue(AttachmentLimits.max_bytes // (1024 * 1024))
+        self.max_file_spin.setKeyboardTracking(False)
+        limits_layout.addWidget(self.max_file_spin)
+        limits_layout.addWidget(QLabel("Max PDF pages:"))
+        self.max_pages_spin = QSpinBox()
+        self.max_pages_spin.setRange(1, 100000)
+        self.max_pages_spin.setValue(AttachmentLimits.max_pages)
+        self.max_pages_spin.setKeyboardTracking(False)
+        limits_layout.addWidget(self.max_pages_spin)
+        limits_layout.addStretch()
+        file_layout.addLayout(limits_layout)
+        
         self.files_list = QListWidget()
         self.files_list.setMaximumHeight(100)
         file_layout.addWidget(self.files_list)
@@ -258,9 +378,7 @@ class OllamaClientApp(QMainWindow):
         
         chat_splitter = QSplitter(Qt.Orientation.Vertical)
         
-        self.chat_display = QTextEdit()
-        self.chat_display.setReadOnly(True)
-        self.chat_display.setPlaceholderText("Chat history will appear here...")
+        self.chat_display = TranscriptView(self.get_theme_color, self.get_text_color)
         chat_splitter.addWidget(self.chat_display)
         
         self.input_text = QTextEdit()
@@ -270,12 +388,19 @@ class OllamaClientApp(QMainWindow):
         button_layout = QHBoxLayout()
         self.generate_btn = QPushButton("Send Message")
         self.generate_btn.setFixedHeight(40)
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setFixedHeight(40)
+        self.stop_btn.setEnabled(False)
         
         input_widget = QWidget()
         input_layout = QVBoxLayout(input_widget)
         input_layout.addWidget(self.input_text)
         input_layout.addLayout(button_layout)
         button_layout.addWidget(self.generate_btn)
+        button_layout.addWidget(self.stop_btn)
+        self.cache_check = QCheckBox("Use cached answers")
+        self.cache_check.setToolTip("Reuse the saved answer for an identical request. Ctrl+Enter always asks the model.")
+        button_layout.addWidget(self.cache_check)
         
         chat_splitter.addWidget(input_widget)
         
@@ -283,20 +408,62 @@ class OllamaClientApp(QMainWindow):
         main_layout.addWidget(chat_splitter)
         
         main_widget.setLayout(main_layout)
-        self.setCentralWidget(main_widget)
+        
+        sessions_widget = QWidget()
+        sessions_layout = QVBoxLayout(sessions_widget)
+        sessions_layout.addWidget(QLabel("Conversations"))
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search conversations...")
+        self.search_edit.setClearButtonEnabled(True)
+        sessions_layout.addWidget(self.search_edit)
+        self.sessions_list = QListWidget()
+        self.sessions_list.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        sessions_layout.addWidget(self.sessions_list)
+        self.delete_session_btn = QPushButton("Delete Conversation")
+        sessions_layout.addWidget(self.delete_session_btn)
+        
+        window_splitter = QSplitter(Qt.Orientation.Horizontal)
+        window_splitter.addWidget(sessions_widget)
+        window_splitter.addWidget(main_widget)
+        window_splitter.setStretchFactor(1, 1)
+        window_splitter.setSizes([220, 900])
+        self.setCentralWidget(window_splitter)
+        self.metrics_label = QLabel()
+        self.statusBar().addPermanentWidget(self.metrics_label)
+        self.export_metrics_btn = QPushButton("Export Metrics...")
+        self.export_metrics_btn.setFlat(True)
+        self.statusBar().addPermanentWidget(self.export_metrics_btn)
     
     def setup_connections(self):
-        self.generate_btn.clicked.connect(self.generate_response)
+        self.generate_btn.clicked.connect(lambda: self.generate_response())
+        self.stop_btn.clicked.connect(self.stop_generation)
+        self.stream_timer.timeout.connect(self.flush_stream_buffer)
         self.refresh_btn.clicked.connect(self.load_models)
         self.add_file_btn.clicked.connect(self.add_file)
         self.clear_files_btn.clicked.connect(self.clear_files)
         self.clear_chat_btn.clicked.connect(self.clear_chat)
+        self.compare_btn.clicked.connect(self.open_compare_window)
+        self.servers_btn.clicked.connect(self.edit_endpoints)
+        self.model_combo.currentTextChanged.connect(self.model_changed)
+        self.preload_timer.timeout.connect(self.preload_model)
+        self.search_timer.timeout.connect(self.refresh_sessions)
+        self.search_edit.textChanged.connect(lambda text: self.search_timer.start())
+        self.sessions_list.itemClicked.connect(self.open_session)
+        self.delete_session_btn.clicked.connect(self.delete_session)
+        self.chat_display.verticalScrollBar().valueChanged.connect(self.transcript_scrolled)
+        self.context_budget_spin.valueChanged.connect(self.context_budget_changed)
+        self.summarize_check.toggled.connect(self.summarize_toggled)
+        self.export_metrics_btn.clicked.connect(self.export_metrics)
+        self.image_side_spin.valueChanged.connect(self.image_side_changed)
+        self.retrieval_check.toggled.connect(lambda checked: self.index_documents())
+        self.embed_model_combo.activated.connect(lambda index: self.index_documents())
+        self.embed_model_combo.lineEdit().editingFinished.connect(self.index_documents)
+        self.ingest_timer.timeout.connect(self.update_file_statuses)
+        self.max_file_spin.valueChanged.connect(lambda value: self.attachment_limits_changed())
+        self.max_pages_spin.valueChanged.connect(lambda value: self.attachment_limits_changed())
         
         self.input_text.installEventFilter(self)
-        
-        self.api_thread.response_received.connect(self.handle_response)
-        self.api_thread.models_received.connect(self.update_models)
-        self.api_thread.error_occurred.connect(self.handle_error)
+
     
     def eventFilter(self, obj, event):
         if obj is self.input_text and event.type() == event.Type.KeyPress:
@@ -306,7 +473,8 @@ class OllamaClientApp(QMainWindow):
             modifiers = event.modifiers()
             
             if key == Qt.Key.Key_Return and not (modifiers & Qt.KeyboardModifier.ShiftModifier):
-                self.generate_response()
+                tracer.instant("enter pressed", "ui")
+                self.generate_response(bypass_cache=bool(modifiers & Qt.KeyboardModifier.ControlModifier))
                 return True
         
         return super().eventFilter(obj, event)
@@ -341,70 +509,240 @@ class OllamaClientApp(QMainWindow):
         else:
             return palette.color(QPalette.ColorRole.Text)
     
+    def generation_in_progress(self):
+        return self.generation_job_id is not None and self.scheduler.is_running(self.generation_job_id)
+    
     def clear_chat(self):
-        self.api_thread.chat_history = []
+        if self.generation_in_progress():
+            self.add_system_message("Wait for the current answer to finish before starting a new conversation.")
+            return
+        self.cancel_summary()
+        self.context.clear()
+        self.generate_context = None
+        self.session_id = None
+        self.history_exhausted = True
+        self.sessions_list.clearSelection()
         self.chat_display.clear()
         self.add_system_message("Chat history cleared. Starting a new conversation.")
     
-    def add_system_message(self, message):
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        
-        format = QTextCharFormat()
-        format.setForeground(self.get_theme_color("system"))
-        cursor.setCharFormat(format)
-        cursor.insertText(f"System: {message}\n\n")
-        
-        self.chat_display.setTextCursor(cursor)
-        self.chat_display.ensureCursorVisible()
+    def record_message(self, role, content, model):
+        """Write a message to the conversation store, starting a session on the first one"""
+        if self.session_id is None:
+            title = content.strip().splitlines()[0][:60] if content.strip() else "New conversation"
+            self.session_id = self.store.create_session(title, model)
+            self.refresh_sessions()
+        self.store.add_message(self.session_id, role, content, model)
     
-    def add_user_message(self, message):
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
+    def refresh_sessions(self):
+        self.sessions_list.clear()
+        query = self.search_edit.text().strip()
+        if query:
+            for session_id, message_id, title, snippet in self.store.search(query):
+                item = QListWidgetItem(f"{title}\n  {snippet}")
+                item.setData(Qt.ItemDataRole.UserRole, session_id)
+                self.sessions_list.addItem(item)
+            return
         
-        prefix_format = QTextCharFormat()
-        prefix_format.setForeground(self.get_theme_color("user"))
-        cursor.setCharFormat(prefix_format)
-        cursor.insertText("You: ")
+        for session_id, title, model, updated_at in self.store.list_sessions():
+            item = QListWidgetItem(title)
+            item.setData(Qt.ItemDataRole.UserRole, session_id)
+            item.setToolTip(model or "")
+            self.sessions_list.addItem(item)
+            if session_id == self.session_id:
+                item.setSelected(True)
+    
+    def open_session(self, item):
+        session_id = item.data(Qt.ItemDataRole.UserRole)
+        if session_id == self.session_id:
+            return
+        if self.generation_in_progress():
+            self.add_system_message("Wait for the current answer to finish before switching conversations.")
+            return
         
-        message_format = QTextCharFormat()
-        message_format.setForeground(self.get_text_color())
-        cursor.setCharFormat(message_format)
-        cursor.insertText(f"{message}\n\n")
+        session = self.store.session(session_id)
+        if session is None:
+            self.refresh_sessions()
+            return
         
-        self.chat_display.setTextCursor(cursor)
-        self.chat_display.ensureCursorVisible()
-    
-    def add_assistant_message(self, message):
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
+        self.history_exhausted = True
+        self.cancel_summary()
+        self.context.clear()
+        self.generate_context = None
+        self.chat_display.clear()
+        self.session_id = session_id
         
-        prefix_format = QTextCharFormat()
-        prefix_format.setForeground(self.get_theme_color("assistant"))
-        cursor.setCharFormat(prefix_format)
-        cursor.insertText("AI: ")
+        rows = self.store.recent_messages(session_id, HISTORY_PAGE_SIZE)
+        self.oldest_loaded_id = rows[0][0] if rows else None
+        self.history_exhausted = len(rows) < HISTORY_PAGE_SIZE
+        for message_id, role, content in rows:
+            self.context.append(role, content)
+            self.chat_display.add_message(role, content)
         
-        message_format = QTextCharFormat()
-        message_format.setForeground(self.get_text_color())
-        cursor.setCharFormat(message_format)
-        cursor.insertText(f"{message}\n\n")
+        model = session[2]
+        if model and self.model_combo.findText(model) >= 0:
+            self.model_combo.setCurrentText(model)
+    
+    def transcript_scrolled(self, value):
+        if value == self.chat_display.verticalScrollBar().minimum():
+            self.load_older_messages()
+    
+    def load_older_messages(self):
+        """Page in the previous slice of the open conversation when scrolled to the top"""
+        if self.session_id is None or self.history_exhausted or self.oldest_loaded_id is None:
+            return
+        transcript = self.chat_display.transcript
+        if transcript.rowCount() >= transcript.max_messages:
+            return
         
-        self.chat_display.setTextCursor(cursor)
-        self.chat_display.ensureCursorVisible()
+        rows = self.store.recent_messages(self.session_id, HISTORY_PAGE_SIZE, before_id=self.oldest_loaded_id)
+        self.history_exhausted = len(rows) < HISTORY_PAGE_SIZE
+        if not rows:
+            return
+        self.oldest_loaded_id = rows[0][0]
+        transcript.prepend_messages([(role, content) for message_id, role, content in rows])
+        self.chat_display.scrollTo(transcript.index(len(rows)), QAbstractItemView.ScrollHint.PositionAtTop)
+    
+    def delete_session(self):
+        item = self.sessions_list.currentItem()
+        if item is None:
+            return
+        session_id = item.data(Qt.ItemDataRole.UserRole)
+        if session_id == self.session_id and self.generation_in_progress():
+            self.add_system_message("Wait for the current answer to finish before deleting this conversation.")
+            return
+        self.store.delete_session(session_id)
+        if session_id == self.session_id:
+            self.clear_chat()
+        self.refresh_sessions()
+    
+    def add_system_message(self, message):
+        self.chat_display.add_message("system", message)
+    
+    def add_user_message(self, message):
+        self.chat_display.add_message("user", message)
+    
+    def add_assistant_message(self, message):
+        started = time.perf_counter()
+        self.chat_display.add_message("assistant", message, self.cache_tag)
+        self.add_render_time(time.perf_counter() - started)
+    
+    def begin_assistant_message(self):
+        self.streaming_message = self.chat_display.add_message("assistant", "", self.cache_tag)
+    
+    def append_assistant_text(self, text):
+        self.chat_display.append_text(self.streaming_message, text)
+    
+    def end_assistant_message(self):
+        self.flush_stream_buffer()
+        self.streaming_message = None
+    
+    def handle_chunk(self, job, chunk):
+        """Buffer streamed text so the display is repainted at most once per timer interval"""
+        if self.streaming_message is None:
+            self.begin_assistant_message()
+        if self.generation_metrics is not None and self.generation_metrics["first_chunk"] is None:
+            self.generation_metrics["first_chunk"] = time.perf_counter()
+            tracer.instant("first chunk received", "ui", job_id=job.job_id)
+        self.stream_buffer.append(chunk)
+        if not self.stream_timer.isActive():
+            self.stream_timer.start()
+    
+    @traced("render", "ui")
+    def flush_stream_buffer(self):
+        self.stream_timer.stop()
+        if self.stream_buffer:
+            text = "".join(self.stream_buffer)
+            self.stream_buffer.clear()
+            started = time.perf_counter()
+            self.append_assistant_text(text)
+            self.add_render_time(time.perf_counter() - started)
+    
+    def stop_generation(self):
+        if self.generation_job_id is not None and self.scheduler.is_running(self.generation_job_id):
+            self.scheduler.cancel(self.generation_job_id)
+            self.stop_btn.setEnabled(False)
+            self.stop_btn.setText("Stopping...")
+    
+    def show_cached_models(self):
+        """Fill the model list from the on-disk catalog while the server is queried in the background"""
+        models = self.catalog.names()
+        if models:
+            self.populate_models(models)
+            self.add_system_message(f"Showing {len(models)} cached models, refreshing...")
     
     def load_models(self):
-        self.add_system_message("Loading models...")
-        self.api_thread.action = "list_models"
-        self.api_thread.start()
+        if self.models_job_id is not None and self.scheduler.is_running(self.models_job_id):
+            return
+        if not self.catalog.names():
+            self.add_system_message("Loading models...")
+        self.models_job_id = self.scheduler.submit(
+            OllamaJob(action="list_models"),
+            on_models=self.update_models,
+            on_error=self.handle_background_error,
+        )
     
-    def update_models(self, models):
-        self.model_combo.clear()
+    def update_models(self, job, models):
+        self.populate_models(models)
         if models:
-            self.model_combo.addItems(models)
-            self.add_system_message(f"Loaded {len(models)} models.")
+            servers = self.scheduler.transport.describe()
+            self.add_system_message(f"Loaded {len(models)} models{f' ({servers})' if servers else ''}.")
         else:
             self.add_system_message("No models found. Make sure Ollama is running.")
     
+    def populate_models(self, models):
+        """Replace the model list, keeping the current selection when it is still installed"""
+        current = self.model_combo.currentText()
+        self.model_combo.blockSignals(True)
+        self.model_combo.clear()
+        for model in models:
+            self.model_combo.addItem(model)
+            self.model_combo.setItemData(self.model_combo.count() - 1, self.catalog.describe(model),
+                                         Qt.ItemDataRole.ToolTipRole)
+            self.context.set_limit(model, self.catalog.context_length(model))
+        if current in models:
+            self.model_combo.setCurrentText(current)
+        self.model_combo.blockSignals(False)
+        if self.compare_window is not None:
+            self.compare_window.set_models(models)
+        embed_model = self.embed_model_combo.currentText()
+        self.embed_model_combo.blockSignals(True)
+        for model in models:
+            if "embed" in model and self.embed_model_combo.findText(model) < 0:
+                self.embed_model_combo.addItem(model)
+        self.embed_model_combo.setCurrentText(embed_model)
+        self.embed_model_combo.blockSignals(False)
+        if self.model_combo.currentText() != current:
+            self.model_changed(self.model_combo.currentText())
+        elif current:
+            self.context_budget_spin.blockSignals(True)
+            self.context_budget_spin.setValue(self.context.budget_for(current))
+            self.context_budget_spin.blockSignals(False)
+    
+    def create_endpoint_pool(self, api_urls):
+        pool = EndpointPool(api_urls)
+        if len(api_urls) > 1:
+            pool.start_health_checks()
+        return pool
+    
+    def edit_endpoints(self):
+        """Configure the Ollama servers requests are spread across"""
+        current = [api_url for api_url, _, _, _ in self.scheduler.transport.status()]
+        text, accepted = QInputDialog.getMultiLineText(
+            self, "Ollama Servers", "API URLs, one per line (requests go to the least busy server with the model):",
+            "\n".join(current))
+        if not accepted:
+            return
+        api_urls = [normalize_api_url(line) for line in text.splitlines() if line.strip()]
+        if not api_urls or api_urls == current:
+            return
+        try:
+            save_endpoint_urls(app_data_path("endpoints.json"), api_urls)
+        except OSError as e:
+            self.add_system_message(f"Error: Could not save the server list: {e}")
+        # Jobs already running keep the old pool until they finish
+        self.scheduler.replace_transport(self.create_endpoint_pool(api_urls))
+        self.load_models()
+    
     def add_file(self):
         file_dialog = QFileDialog()
         file_dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
@@ -414,27 +752,109 @@ class OllamaClientApp(QMainWindow):
             selected_files = file_dialog.selectedFiles()
             for file_path in selected_files:
                 if file_path not in self.file_paths:
-                    mime_type = self.api_thread._get_mime_type(file_path)
+                    mime_type = get_mime_type(file_path)
                     if mime_type.startswith('image/') or mime_type == 'text/plain' or mime_type == 'application/pdf':
                         self.file_paths.append(file_path)
-                        file_name = os.path.basename(file_path)
-                        if mime_type.startswith('image/'):
-                            display_name = f"📷 {file_name}"
-                        elif mime_type == 'text/plain':
-                            display_name = f"📄 {file_name}"
-                        elif mime_type == 'application/pdf':
-                            display_name = f"📑 {file_name}"
-                        else:
-                            display_name = f"📎 {file_name}"
-                        self.files_list.addItem(display_name)
+                        item = QListWidgetItem(self.file_label(file_path, "queued"))
+                        item.setData(Qt.ItemDataRole.UserRole, file_path)
+                        self.files_list.addItem(item)
+                        self.ingest_file(file_path)
                     else:
-                        self.chat_display.setPlainText(f"Unsupported file type: {file_path}")
+                        self.add_system_message(f"Unsupported file type: {file_path}")
+            self.index_documents()
+    
+    def file_label(self, file_path, status):
+        mime_type = get_mime_type(file_path)
+        file_name = os.path.basename(file_path)
+        if mime_type.startswith('image/'):
+            display_name = f"📷 {file_name}"
+        elif mime_type == 'text/plain':
+            display_name = f"📄 {file_name}"
+        elif mime_type == 'application/pdf':
+            display_name = f"📑 {file_name}"
+        else:
+            display_name = f"📎 {file_name}"
+        return f"{display_name} — {status}"
+    
+    def ingest_file(self, file_path):
+        """Start extracting a file in the background; its list entry tracks the progress"""
+        future = self.scheduler.attachments.submit(file_path, self.image_policy(self.model_combo.currentText()))
+        self.file_futures[file_path] = future
+        self.ingest_timer.start()
+    
+    def update_file_statuses(self):
+        busy = False
+        for row in range(self.files_list.count()):
+            item = self.files_list.item(row)
+            file_path = item.data(Qt.ItemDataRole.UserRole)
+            future = self.file_futures.get(file_path)
+            if future is None or future.cancelled():
+                continue
+            if not future.done():
+                busy = True
+                progress = self.scheduler.attachments.file_progress(file_path)
+                if progress is None:
+                    status = "queued"
+                elif get_mime_type(file_path) == 'application/pdf' and progress[1] > 1:
+                    status = f"page {progress[0]} of {progress[1]}"
+                elif progress[1] > 1:
+                    status = f"reading {100 * progress[0] // progress[1]}%"
+                else:
+                    status = "processing..."
+                item.setText(self.file_label(file_path, status))
+                continue
+            error = future.exception()
+            if error is not None:
+                item.setText(self.file_label(file_path, "failed, will not be sent"))
+                item.setToolTip(str(error))
+                item.setForeground(QColor("#D9534F"))
+                continue
+            attachment = future.result()
+            if attachment.kind == "image":
+                status = "ready"
+            elif attachment.paged:
+                status = f"ready, {len(attachment.pages)} pages"
+            else:
+                status = f"ready, {sum(len(page) for page in attachment.pages):,} characters"
+            item.setText(self.file_label(file_path, status))
+            item.setToolTip("")
+            item.setForeground(self.files_list.palette().text())
+        if not busy:
+            self.ingest_timer.stop()
+    
+    def attached_files(self):
+        """The attached files, minus those whose extraction failed"""
+        failed = {file_path for file_path, future in self.file_futures.items()
+                  if future.done() and not future.cancelled() and future.exception() is not None}
+        return tuple(file_path for file_path in self.file_paths if file_path not in failed)
+    
+    def attachment_limits(self):
+        return AttachmentLimits(max_bytes=self.max_file_spin.value() * 1024 * 1024,
+                                max_pages=self.max_pages_spin.value())
+    
+    def attachment_limits_changed(self):
+        """Check every attached file against the new limits; extracted text is reused from the cache"""
+        if self.scheduler is None:
+            return
+        self.scheduler.attachments.limits = self.attachment_limits()
+        for file_path in self.file_paths:
+            self.scheduler.attachments.discard(file_path)
+            self.ingest_file(file_path)
+    
+    def report_skipped_files(self, job, skipped):
+        for file_path, message in skipped:
+            self.add_system_message(f"Skipped {os.path.basename(file_path)}: {message}")
     
     def clear_files(self):
+        for file_path in self.file_paths:
+            self.scheduler.attachments.discard(file_path)
         self.file_paths.clear()
+        self.file_futures.clear()
         self.files_list.clear()
+        self.ingest_timer.stop()
     
-    def generate_response(self):
+    @traced("input handling", "ui")
+    def generate_response(self, bypass_cache=False):
         if not self.model_combo.currentText():
             self.add_system_message("Please select a model first.")
             return
@@ -445,9 +865,11 @@ class OllamaClientApp(QMainWindow):
             return
         
         self.add_user_message(prompt)
+        self.record_message("user", prompt, self.model_combo.currentText())
         
         self.generate_btn.setEnabled(False)
         self.generate_btn.setText("Generating...")
+        self.stop_btn.setEnabled(True)
         
         self.input_text.clear()
         
@@ -455,88 +877,311 @@ class OllamaClientApp(QMainWindow):
         if instructions and ("document" in instructions.lower() or "pdf" in instructions.lower()):
             self.add_system_message("Reminder: The model will try to follow your instructions to only use document content, but may not always comply perfectly.")
         
-        self.api_thread.action = "generate"
-        self.api_thread.model = self.model_combo.currentText()
-        self.api_thread.prompt = prompt
-        self.api_thread.instructions = instructions
-        self.api_thread.files = self.file_paths.copy()
-        self.api_thread.start()
+        job, first_kept = self.build_generate_job(self.model_combo.currentText(), prompt, bypass_cache)
+        self.cache_tag = ""
+        self.retrieval_note = ""
+        self.generation_metrics = {"started": time.perf_counter(), "first_chunk": None, "render_s": 0.0,
+                                   "stats": {}, "timings": {}, "cached": False}
+        self.generation_job_id = self.scheduler.submit(
+            job,
+            on_response=self.handle_response,
+            on_chunk=self.handle_chunk,
+            on_error=self.handle_error,
+            on_prepared=self.report_request_size,
+            on_context=self.store_generate_context,
+            on_cache=self.show_cache_status,
+            on_stats=self.store_request_stats,
+            on_timings=self.store_request_timings,
+            on_retrieval=self.report_retrieval,
+            on_skipped=self.report_skipped_files,
+        )
+        self.summarize_history(job.model, first_kept)
     
-    def handle_response(self, response):
-        self.add_assistant_message(response)
+    def build_generate_job(self, model, prompt, bypass_cache=False, reuse_context=True):
+        """A generate job for the prompt with the current history, instructions and attachments.
         
-        self.generate_btn.setEnabled(True)
-        self.generate_btn.setText("Send Message")
+        Returns the job and the index of the oldest history message that fit the model's budget.
+        """
+        instructions = self.instructions_text.toPlainText()
+        history, _, first_kept = self.context.select(model, prompt, instructions)
+        job = OllamaJob(
+            action="generate",
+            model=model,
+            prompt=prompt,
+            instructions=instructions,
+            files=self.attached_files(),
+            history=history,
+            context=self.reusable_generate_context(model) if reuse_context else (),
+            keep_alive=self.keep_alive_combo.currentData(),
+            cache_mode=("refresh" if bypass_cache else "use") if self.cache_check.isChecked() else None,
+            image_policy=self.image_policy(model),
+            retrieval=self.retrieval_settings(),
+        )
+        return job, first_kept
+    
+    def open_compare_window(self):
+        """Side-by-side answers from several models, sharing this chat's history and attachments"""
+        if self.compare_window is None:
+            from ollama_compare import CompareWindow
+            self.compare_window = CompareWindow(
+                self.scheduler,
+                lambda model, prompt: self.build_generate_job(model, prompt, reuse_context=False)[0],
+                self.metrics, self)
+            self.compare_window.set_models([self.model_combo.itemText(row) for row in range(self.model_combo.count())])
+        if not self.compare_window.prompt_text.toPlainText():
+            self.compare_window.prompt_text.setPlainText(self.input_text.toPlainText())
+        self.compare_window.show()
+        self.compare_window.raise_()
+        self.compare_window.activateWindow()
+    
+    @traced("response", "ui")
+    def handle_response(self, job, response):
+        if self.streaming_message is not None:
+            self.end_assistant_message()
+        else:
+            self.add_assistant_message(response)
+        
+        self.context.append("user", job.prompt)
+        self.context.append("assistant", response)
+        self.record_message("assistant", response, job.model)
+        self.record_request_metrics(job)
+        
+        if self.scheduler.is_cancelled(job.job_id):
+            self.add_system_message("Generation stopped.")
+        
+        self.reset_generate_buttons()
         
         self.clear_files()
     
-    def handle_error(self, error_msg):
+    def handle_error(self, job, error_msg):
+        self.generation_metrics = None
+        if self.streaming_message is not None:
+            self.end_assistant_message()
         self.add_system_message(f"Error: {error_msg}")
-        self.generate_btn.setEnabled(True)
-        self.generate_btn.setText("Send Message")
-
-    def refresh_chat_display(self):
-        messages = []
+        self.reset_generate_buttons()
+    
+    def report_request_size(self, job, tokens):
+        kept = sum(1 for role, content in job.history if role != "system")
+        self.statusBar().showMessage(
+            f"Sent ~{tokens} tokens to {job.model} ({kept} of {len(self.context.messages)} history messages"
+            f"{self.retrieval_note}, budget {self.context.budget_for(job.model)})")
+    
+    def report_retrieval(self, job, value):
+        used, total = value
+        self.retrieval_note = f", {used} of {total} document passages"
+    
+    def retrieval_settings(self):
+        if not self.retrieval_check.isChecked() or not self.embed_model_combo.currentText().strip():
+            return None
+        return RetrievalSettings(embed_model=self.embed_model_combo.currentText().strip(),
+                                 top_k=self.top_k_spin.value())
+    
+    def index_documents(self):
+        """Embed the attached documents in the background so the next message only has to search them"""
+        settings = self.retrieval_settings()
+        documents = tuple(path for path in self.attached_files() if not get_mime_type(path).startswith('image/'))
+        if settings is None or not documents:
+            return
+        self.statusBar().showMessage(f"Indexing {len(documents)} documents with {settings.embed_model}...")
+        self.scheduler.submit(
+            OllamaJob(action="index", files=documents, retrieval=settings),
+            on_response=lambda job, chunks: self.statusBar().showMessage(
+                f"Indexed {chunks} passages from {len(job.files)} documents."),
+            on_error=self.handle_background_error,
+            on_skipped=self.report_skipped_files,
+        )
+    
+    def model_changed(self, model):
+        if model:
+            self.context_budget_spin.blockSignals(True)
+            self.context_budget_spin.setValue(self.context.budget_for(model))
+            self.context_budget_spin.blockSignals(False)
+            self.image_side_spin.blockSignals(True)
+            self.image_side_spin.setValue(self.image_sides.get(model, ImagePolicy.max_side))
+            self.image_side_spin.blockSignals(False)
+            description = self.catalog.describe(model)
+            if description:
+                self.statusBar().showMessage(f"{model}: {description}")
+            self.metrics_label.setToolTip(self.metrics.describe(model))
+            self.preload_timer.start()
+    
+    def preload_model(self):
+        model = self.model_combo.currentText()
+        if not model:
+            return
+        if self.preload_job_id is not None:
+            self.scheduler.cancel(self.preload_job_id)
+        self.statusBar().showMessage(f"Loading {model}...")
+        self.preload_job_id = self.scheduler.submit(
+            OllamaJob(action="preload", model=model, keep_alive=self.keep_alive_combo.currentData()),
+            on_response=lambda job, response: self.statusBar().showMessage(f"{job.model} is loaded and ready."),
+            on_error=self.handle_background_error,
+        )
+    
+    def show_cache_status(self, job, hit):
+        self.cache_tag = "cache hit" if hit else "cache miss"
+        if self.generation_metrics is not None:
+            self.generation_metrics["cached"] = hit
+    
+    def store_request_stats(self, job, stats):
+        if self.generation_metrics is not None:
+            self.generation_metrics["stats"] = stats
+    
+    def store_request_timings(self, job, timings):
+        if self.generation_metrics is not None:
+            self.generation_metrics["timings"] = timings
+    
+    def add_render_time(self, seconds):
+        if self.generation_metrics is not None:
+            self.generation_metrics["render_s"] += seconds
+    
+    def record_request_metrics(self, job):
+        """Log the finished request in the per-model history and show its readout"""
+        pending = self.generation_metrics
+        self.generation_metrics = None
+        if pending is None or self.scheduler.is_cancelled(job.job_id):
+            return
+        finished = time.perf_counter()
+        timings = dict(pending["timings"])
+        timings["total_s"] = finished - pending["started"]
+        timings["render_s"] = pending["render_s"]
+        if pending["first_chunk"] is not None:
+            timings["ttft_s"] = pending["first_chunk"] - pending["started"]
+        entry = build_entry(job.model, pending["stats"], timings, cached=pending["cached"])
+        self.metrics.record(entry)
+        self.metrics_label.setText(format_readout(entry))
+        self.metrics_label.setToolTip(self.metrics.describe(job.model))
+    
+    def export_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", "ollama-metrics.csv",
+                                              "CSV Files (*.csv);;JSON Files (*.json)")
+        if not path:
+            return
+        try:
+            self.metrics.export(path)
+        except OSError as e:
+            self.add_system_message(f"Error: Could not export metrics: {e}")
+            return
+        self.statusBar().showMessage(f"Exported {len(self.metrics.history())} requests to {path}")
+    
+    def store_generate_context(self, job, context):
+        # The context only stays valid while no other turn is added to the conversation,
+        # so remember how long the history will be once this reply is appended
+        self.generate_context = (job.model, len(self.context.messages) + 2, tuple(context))
+    
+    def reusable_generate_context(self, model):
+        if self.generate_context is None:
+            return ()
+        context_model, message_count, context = self.generate_context
+        if context_model != model or message_count != len(self.context.messages):
+            return ()
+        if len(context) > self.context.budget_for(model):
+            # The server-side transcript has outgrown the budget; resend the trimmed history instead
+            self.generate_context = None
+            return ()
+        return context
+    
+    def context_budget_changed(self, tokens):
+        model = self.model_combo.currentText()
+        if model:
+            self.context.set_budget(model, tokens)
+        else:
+            self.context.default_budget = tokens
+    
+    def image_side_changed(self, max_side):
+        model = self.model_combo.currentText()
+        if model:
+            self.image_sides[model] = max_side
+    
+    def image_policy(self, model):
+        """How images are prepared for the model; vision encoders work at a fixed, modest resolution"""
+        return ImagePolicy(max_side=self.image_sides.get(model, ImagePolicy.max_side),
+                           format=self.image_format_combo.currentData(),
+                           quality=self.image_quality_spin.value())
+    
+    def summarize_toggled(self, checked):
+        self.context.summarize = checked
+    
+    def summarize_history(self, model, first_kept):
+        """Fold turns that slid out of the context window into a model-written summary"""
+        if self.summary_job_id is not None and self.scheduler.is_running(self.summary_job_id):
+            return
+        dropped = self.context.pending_summary(first_kept, model)
+        if not dropped:
+            return
         
-        doc = self.chat_display.document()
-        text = doc.toPlainText()
+        # Long backlogs are summarized in batches that each fit the model's budget
+        covered_count = self.context.summarized_count + len(dropped)
+        generation = self.context.generation
         
-        self.chat_display.clear()
+        def apply_summary(job, summary):
+            self.context.apply_summary(summary, covered_count, generation)
+            if self.context.generation == generation and self.context.summarized_count == covered_count < first_kept:
+                self.summary_job_id = None
+                self.summarize_history(model, first_kept)
         
-        if not text.strip():
-            return
-            
-        lines = text.split('\n')
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            
-            if line.startswith("System:"):
-                message = line[7:].strip()
-                
-                i += 1
-                while i < len(lines) and lines[i].strip():
-                    message += '\n' + lines[i].strip()
-                    i += 1
-                    
-                self.add_system_message(message)
-                
-            elif line.startswith("You:"):
-                message = line[4:].strip()
-                
-                i += 1
-                while i < len(lines) and lines[i].strip():
-                    message += '\n' + lines[i].strip()
-                    i += 1
-                    
-                self.add_user_message(message)
-                
-            elif line.startswith("AI:"):
-                message = line[3:].strip()
-                
-                i += 1
-                while i < len(lines) and lines[i].strip():
-                    message += '\n' + lines[i].strip()
-                    i += 1
-                    
-                self.add_assistant_message(message)
-                
-            else:
-                i += 1
+        def report_error(job, error_msg):
+            # A summary cancelled along with its conversation is not worth a message in the next one
+            if self.context.generation == generation:
+                self.handle_background_error(job, error_msg)
         
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        self.chat_display.setTextCursor(cursor)
-        self.chat_display.ensureCursorVisible()
+        self.summary_job_id = self.scheduler.submit(
+            OllamaJob(action="generate", model=model, prompt=self.context.summary_prompt(dropped, model)),
+            on_response=apply_summary,
+            on_error=report_error,
+        )
+    
+    def cancel_summary(self):
+        """Drop a summary still being written for the conversation that is being left"""
+        if self.summary_job_id is not None:
+            self.scheduler.cancel(self.summary_job_id)
+            self.summary_job_id = None
+    
+    def handle_background_error(self, job, error_msg):
+        self.add_system_message(f"Error: {error_msg}")
+    
+    def reset_generate_buttons(self):
+        self.generate_btn.setEnabled(True)
+        self.generate_btn.setText("Send Message")
+        self.stop_btn.setEnabled(False)
+        self.stop_btn.setText("Stop")
 
     def changeEvent(self, event):
         if event.type() == event.Type.PaletteChange:
-            self.refresh_chat_display()
+            self.chat_display.restyle()
         super().changeEvent(event)
 
+    def closeEvent(self, event):
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
+            self.store.close()
+            try:
+                self.metrics.save()
+            except OSError:
+                pass
+        super().closeEvent(event)
+
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    startup = StartupTimer(PROCESS_STARTED)
+    startup.mark("imports")
+    # "1" prints the startup timings to stderr, "exit" also quits once the window is interactive
+    startup_report = os.environ.get("OLLAMA_UI_STARTUP_REPORT", "1" if "--startup-report" in sys.argv else "")
+    trace_path = os.environ.get("OLLAMA_UI_TRACE") or option_value(sys.argv, "--trace")
+    profile_path = os.environ.get("OLLAMA_UI_PROFILE") or option_value(sys.argv, "--profile")
+    if trace_path:
+        tracer.enable()
     app = QApplication(sys.argv)
-    window = OllamaClientApp()
+    app.setApplicationName("Ollama UI")
+    startup.mark("application")
+    window = OllamaClientApp(startup, startup_report)
+    startup.mark("window")
     window.show()
-    sys.exit(app.exec())
+    with profiled(profile_path):
+        exit_code = app.exec()
+    if trace_path:
+        tracer.save(trace_path)
+        print(f"Trace written to {trace_path}", file=sys.stderr)
+    sys.exit(exit_code)
@@ -0,0 +1,197 @@
+import time
+from collections import deque
+
+from PyQt6.QtWidgets import (QWidget, QGroupBox, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QLabel,
+                             QListWidget, QListWidgetItem, QPushButton, QSpinBox, QSplitter, QTextEdit)
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QTextCursor
+
+from ollama_metrics import build_entry, format_readout
+
+
+class CompareColumn(QGroupBox):
+    """One model's answer and its timing readout"""
+
+    def __init__(self, model, parent=None):
+        super().__init__(model, parent)
+        self.model = model
+        self.buffer = []
+        layout = QVBoxLayout(self)
+        self.answer = QPlainTextEdit()
+        self.answer.setReadOnly(True)
+        layout.addWidget(self.answer)
+        self.status = QLabel("Queued")
+        self.status.setWordWrap(True)
+        layout.addWidget(self.status)
+
+    def flush(self):
+        if self.buffer:
+            cursor = self.answer.textCursor()
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertText("".join(self.buffer))
+            self.buffer.clear()
+
+    def set_answer(self, text):
+        self.buffer.clear()
+        self.answer.setPlainText(text)
+
+
+class CompareWindow(QWidget):
+    """Sends one prompt to several models and shows their answers side by side.
+
+    make_job(model, prompt) builds the job, so every model gets the same history,
+    instructions and attachments as the main chat. At most `concurrency` requests are in
+    flight; the rest wait their turn.
+    """
+
+    def __init__(self, scheduler, make_job, metrics=None, parent=None):
+        super().__init__(parent)
+        self.setWindowFlag(Qt.WindowType.Window)
+        self.setWindowTitle("Compare Models")
+        self.resize(1100, 650)
+        self.scheduler = scheduler
+        self.make_job = make_job
+        self.metrics = metrics
+        self.pending = deque()
+        self.running = {}
+        self.columns = {}
+        self.prompt = None
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(50)
+        self.flush_timer.timeout.connect(self.flush_columns)
+
+        controls = QWidget()
+        controls_layout = QVBoxLayout(controls)
+        controls_layout.addWidget(QLabel("Models:"))
+        self.models_list = QListWidget()
+        controls_layout.addWidget(self.models_list)
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Parallel requests:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, scheduler.pool.maxThreadCount())
+        self.concurrency_spin.setValue(2)
+        self.concurrency_spin.setToolTip("How many models run at once; keep it within what the server can hold in memory")
+        concurrency_layout.addWidget(self.concurrency_spin)
+        controls_layout.addLayout(concurrency_layout)
+        self.prompt_text = QTextEdit()
+        self.prompt_text.setPlaceholderText("Prompt to send to every selected model...")
+        self.prompt_text.setMaximumHeight(120)
+        controls_layout.addWidget(self.prompt_text)
+        buttons_layout = QHBoxLayout()
+        self.send_btn = QPushButton("Compare")
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setEnabled(False)
+        buttons_layout.addWidget(self.send_btn)
+        buttons_layout.addWidget(self.stop_btn)
+        controls_layout.addLayout(buttons_layout)
+
+        self.columns_splitter = QSplitter(Qt.Orientation.Horizontal)
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        splitter.addWidget(controls)
+        splitter.addWidget(self.columns_splitter)
+        splitter.setStretchFactor(1, 1)
+        splitter.setSizes([250, 850])
+        layout = QVBoxLayout(self)
+        layout.addWidget(splitter)
+
+        self.send_btn.clicked.connect(self.compare)
+        self.stop_btn.clicked.connect(self.stop)
+
+    def set_models(self, models):
+        """Replace the model list, keeping the checked models that are still installed"""
+        checked = set(self.selected_models())
+        self.models_list.clear()
+        for model in models:
+            item = QListWidgetItem(model)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if model in checked else Qt.CheckState.Unchecked)
+            self.models_list.addItem(item)
+
+    def selected_models(self):
+        return [self.models_list.item(row).text() for row in range(self.models_list.count())
+                if self.models_list.item(row).checkState() == Qt.CheckState.Checked]
+
+    def compare(self):
+        prompt = self.prompt_text.toPlainText().strip()
+        models = self.selected_models()
+        if not prompt or not models or self.running:
+            return
+        self.prompt = prompt
+        for column in self.columns.values():
+            column.deleteLater()
+        self.columns = {}
+        for model in models:
+            column = CompareColumn(model)
+            self.columns[model] = column
+            self.columns_splitter.addWidget(column)
+        self.pending = deque(models)
+        self.send_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.flush_timer.start()
+        self.start_next()
+
+    def start_next(self):
+        while self.pending and len(self.running) < self.concurrency_spin.value():
+            model = self.pending.popleft()
+            job = self.make_job(model, self.prompt)
+            self.columns[model].status.setText("Generating...")
+            self.running[job.job_id] = {"started": time.perf_counter(), "first_chunk": None, "stats": {},
+                                        "timings": {}, "cached": False}
+            self.scheduler.submit(
+                job,
+                on_chunk=self.handle_chunk,
+                on_response=self.handle_response,
+                on_error=self.handle_error,
+                on_stats=lambda job, stats: self.running[job.job_id].update(stats=stats),
+                on_timings=lambda job, timings: self.running[job.job_id].update(timings=timings),
+                on_cache=lambda job, hit: self.running[job.job_id].update(cached=hit),
+            )
+
+    def handle_chunk(self, job, chunk):
+        state = self.running.get(job.job_id)
+        if state is not None and state["first_chunk"] is None:
+            state["first_chunk"] = time.perf_counter()
+        self.columns[job.model].buffer.append(chunk)
+
+    def handle_response(self, job, response):
+        state = self.running.pop(job.job_id, None)
+        column = self.columns[job.model]
+        column.set_answer(response)
+        if state is not None and not self.scheduler.is_cancelled(job.job_id):
+            timings = dict(state["timings"])
+            timings["total_s"] = time.perf_counter() - state["started"]
+            if state["first_chunk"] is not None:
+                timings["ttft_s"] = state["first_chunk"] - state["started"]
+            entry = build_entry(job.model, state["stats"], timings, cached=state["cached"])
+            column.status.setText(format_readout(entry))
+            if self.metrics is not None:
+                self.metrics.record(entry)
+        else:
+            column.status.setText("Stopped")
+        self.job_finished()
+
+    def handle_error(self, job, error_msg):
+        self.running.pop(job.job_id, None)
+        column = self.columns[job.model]
+        column.flush()
+        column.status.setText(f"Error: {error_msg}")
+        self.job_finished()
+
+    def job_finished(self):
+        self.start_next()
+        if not self.running and not self.pending:
+            self.flush_timer.stop()
+            self.flush_columns()
+            self.send_btn.setEnabled(True)
+            self.stop_btn.setEnabled(False)
+
+    def flush_columns(self):
+        for column in self.columns.values():
+            column.flush()
+
+    def stop(self):
+        for model in self.pending:
+            self.columns[model].status.setText("Skipped")
+        self.pending.clear()
+        for job_id in list(self.running):
+            self.scheduler.cancel(job_id)
@@ -0,0 +1,139 @@
+DEFAULT_TOKEN_BUDGET = 4096
+CHARS_PER_TOKEN = 4
+# Room for the summarization instructions and the prefixes added to each message
+SUMMARY_OVERHEAD_TOKENS = 128
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting; Ollama tokenizers average about four characters per token"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + 1
+
+
+class ContextWindow:
+    """Conversation history kept within a per-model token budget"""
+
+    def __init__(self, default_budget=DEFAULT_TOKEN_BUDGET, reserve_tokens=512, summarize=False):
+        self.default_budget = default_budget
+        self.reserve_tokens = reserve_tokens
+        self.summarize = summarize
+        self.budgets = {}
+        self.limits = {}
+        # Bumped on every clear, so results computed for an earlier conversation can be recognized
+        self.generation = 0
+        self.clear()
+
+    def clear(self):
+        self.generation += 1
+        self.messages = []
+        self.total_tokens = 0
+        self.summary = None
+        self.summary_tokens = 0
+        self.summarized_count = 0
+
+    def budget_for(self, model):
+        budget = self.budgets.get(model, self.default_budget)
+        limit = self.limits.get(model)
+        return min(budget, limit) if limit else budget
+
+    def set_budget(self, model, tokens):
+        self.budgets[model] = tokens
+
+    def set_limit(self, model, context_length):
+        """Cap the budget at the model's trained context length"""
+        if context_length:
+            self.limits[model] = context_length
+        else:
+            self.limits.pop(model, None)
+
+    def append(self, role, content):
+        tokens = estimate_tokens(content)
+        self.messages.append({"role": role, "content": content, "tokens": tokens})
+        self.total_tokens += tokens
+
+    def select(self, model, prompt, instructions=""):
+        """Pick the newest messages that fit in the model's budget.
+
+        Returns (history, tokens, first_kept) where history is a tuple of (role, content)
+        pairs, tokens is the estimated size of the request and first_kept is the index of
+        the oldest message that still fits.
+        """
+        fixed = estimate_tokens(prompt) + estimate_tokens(instructions) * 2 + self.summary_tokens
+        available = self.budget_for(model) - self.reserve_tokens - fixed
+
+        used = 0
+        first_kept = len(self.messages)
+        while first_kept > self.summarized_count:
+            tokens = self.messages[first_kept - 1]["tokens"]
+            if used + tokens > available:
+                break
+            used += tokens
+            first_kept -= 1
+
+        # Never open the window on an assistant reply whose question was cut off
+        while first_kept < len(self.messages) and self.messages[first_kept]["role"] != "user":
+            used -= self.messages[first_kept]["tokens"]
+            first_kept += 1
+
+        history = []
+        if self.summary:
+            history.append(("system", f"Summary of the earlier conversation: {self.summary}"))
+        history.extend((msg["role"], msg["content"]) for msg in self.messages[first_kept:])
+        return tuple(history), fixed + used, first_kept
+
+    def summary_budget(self, model):
+        """Tokens of conversation one summary request can carry without exceeding the model's budget"""
+        return max(self.budget_for(model) - self.reserve_tokens - self.summary_tokens - SUMMARY_OVERHEAD_TOKENS,
+                   CHARS_PER_TOKEN)
+
+    def pending_summary(self, first_kept, model=None):
+        """Messages that slid out of the window and are not covered by the summary yet.
+
+        With a model, only the oldest of them that fit in one summary request for it; the
+        rest are left for the next batch.
+        """
+        if not self.summarize or first_kept <= self.summarized_count:
+            return []
+        pending = self.messages[self.summarized_count:first_kept]
+        if model is None:
+            return pending
+        available = self.summary_budget(model)
+        batch = []
+        used = 0
+        for msg in pending:
+            if batch and used + msg["tokens"] > available:
+                break
+            batch.append(msg)
+            used += msg["tokens"]
+        return batch
+
+    def summary_prompt(self, messages, model=None):
+        """The summarization request; with a model, messages are cut short to fit its budget"""
+        remaining_chars = self.summary_budget(model) * CHARS_PER_TOKEN if model else None
+        lines = []
+        if self.summary:
+            lines.append(f"Summary so far: {self.summary}\n")
+        for msg in messages:
+            prefix = "User" if msg["role"] == "user" else "Assistant"
+            content = msg["content"]
+            if remaining_chars is not None:
+                if remaining_chars <= 0:
+                    break
+                if len(content) > remaining_chars:
+                    content = f"{content[:remaining_chars]} [...]"
+                remaining_chars -= len(content)
+            lines.append(f"{prefix}: {content}\n")
+        lines.append("\nSummarize the conversation above in a few sentences, keeping names, facts and decisions "
+                     "that later questions may refer to. Reply with the summary only.")
+        return "\n".join(lines)
+
+    def apply_summary(self, summary, covered_count, generation=None):
+        """Use a summary of the first covered_count messages, unless it was made for an earlier conversation"""
+        if generation is not None and generation != self.generation:
+            return
+        if covered_count <= self.summarized_count or covered_count > len(self.messages):
+            return
+        self.summary = summary.strip()
+        self.summary_tokens = estimate_tokens(self.summary)
+        self.summarized_count = covered_count
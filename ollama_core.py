@@ -0,0 +1,330 @@
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from ollama_attachments import AttachmentLimitError, ImagePolicy
+from ollama_cache import request_key
+from ollama_context import estimate_tokens
+from ollama_payload import PreparedChat
+from ollama_retrieval import RetrievalSettings, Retriever
+from ollama_trace import tracer
+from ollama_transport import TransportError
+
+
+# Timing and token counters Ollama reports on the final chunk of a generation
+STAT_FIELDS = ("total_duration", "load_duration", "prompt_eval_count", "prompt_eval_duration",
+               "eval_count", "eval_duration")
+
+_job_ids = itertools.count(1)
+
+
+class AttachmentError(Exception):
+    """An attached file could not be read or converted"""
+
+
+@dataclass(frozen=True)
+class OllamaJob:
+    """A single API request; jobs are never modified once submitted"""
+    action: str
+    model: str = None
+    prompt: str = None
+    instructions: str = None
+    files: tuple = ()
+    history: tuple = ()
+    context: tuple = ()
+    keep_alive: str = None
+    cache_mode: str = None
+    image_policy: ImagePolicy = None
+    retrieval: RetrievalSettings = None
+    job_id: int = field(default_factory=lambda: next(_job_ids), compare=False)
+
+
+class OllamaJobRunner:
+    """Executes one job against the API and reports progress through emit(kind, value).
+    
+    Kinds are "chunk", "prepared", "skipped", "retrieval", "cache", "context", "stats", "timings", "response",
+    "models" and "error".
+    """
+    
+    def __init__(self, job, transport, attachments, emit, stream=True, response_cache=None, catalog=None,
+                 document_index=None):
+        self.job = job
+        self.transport = transport
+        self.attachments = attachments
+        self.emit = emit
+        self.response_cache = response_cache
+        self.catalog = catalog
+        self.document_index = document_index
+        self.cache_key = None
+        self.stream = stream
+        self.cancel_event = threading.Event()
+        self.timings = {}
+        self.request_started = None
+        
+    def cancel(self):
+        """Ask a running generation to stop after the chunk currently being read"""
+        self.cancel_event.set()
+        
+    def run(self):
+        try:
+            if self.job.action == "generate":
+                self._generate_response()
+            elif self.job.action == "list_models":
+                self._list_models()
+            elif self.job.action == "preload":
+                self._preload_model()
+            elif self.job.action == "index":
+                self._index_documents()
+        except Exception as e:
+            self.emit("error", f"Error: {str(e)}")
+    
+    def prepare_chat(self):
+        """Gather what the job sends: history, prompt, attachment text and images.
+        
+        Returns a PreparedChat. A file that cannot be read is left out and reported as "skipped"
+        with (file_path, message) pairs, so one bad file does not cost the others' work.
+        """
+        instructions = self.job.instructions if self.job.instructions and self.job.instructions.strip() else None
+        prepared = PreparedChat(
+            model=self.job.model,
+            instructions=instructions,
+            history=self.job.history,
+            prompt=self.job.prompt,
+            keep_alive=self.job.keep_alive,
+            stream=self.stream,
+        )
+        
+        if self.job.files:
+            documents = []
+            skipped = []
+            
+            for file_path in self.job.files:
+                try:
+                    with tracer.span("attachment wait", "request", file=os.path.basename(file_path)):
+                        attachment = self._load_attachment(file_path)
+                except AttachmentError as e:
+                    skipped.append((file_path, str(e)))
+                    continue
+                prepared.attachment_digests.append(attachment.digest)
+                if attachment.kind == "image":
+                    prepared.images.append(attachment.image_data)
+                else:
+                    documents.append((os.path.basename(file_path), attachment))
+            
+            if skipped:
+                self.emit("skipped", skipped)
+            
+            if documents and self.job.retrieval is not None and self.document_index is not None:
+                with tracer.span("retrieval", "request"):
+                    prepared.attachment_text = self._retrieve_excerpts(documents)
+            else:
+                prepared.attachment_text = "".join(attachment.render(file_name) for file_name, attachment in documents)
+        
+        return prepared
+    
+    def _load_attachment(self, file_path):
+        try:
+            return self.attachments.result(file_path, self.job.image_policy)
+        except AttachmentLimitError as e:
+            raise AttachmentError(str(e))
+        except ImportError:
+            raise AttachmentError("PyPDF2 not installed. Please install it to process PDF files: pip install PyPDF2")
+        except Exception as e:
+            raise AttachmentError(f"Error processing file {file_path}: {str(e)}")
+    
+    def _retriever(self):
+        try:
+            import numpy
+        except ImportError:
+            raise AttachmentError("NumPy not installed. Please install it to use retrieval mode: pip install numpy")
+        return Retriever(self.transport, self.document_index, self.job.retrieval, cancel_event=self.cancel_event)
+    
+    def _retrieve_excerpts(self, documents):
+        """Only the chunks most similar to the prompt, instead of the documents' full text"""
+        retriever = self._retriever()
+        try:
+            text, used, total = retriever.excerpts(self.job.prompt, documents)
+        except Exception as e:
+            raise AttachmentError(f"Retrieval failed: {str(e)}")
+        self.emit("retrieval", (used, total))
+        return text
+    
+    def _index_documents(self):
+        """Embed the job's documents ahead of time so the first question does not wait for it"""
+        retriever = self._retriever()
+        chunk_count = 0
+        skipped = []
+        for file_path in self.job.files:
+            try:
+                attachment = self._load_attachment(file_path)
+            except AttachmentError as e:
+                skipped.append((file_path, str(e)))
+                continue
+            if attachment.kind != "image":
+                chunks, _ = retriever.ensure_indexed(attachment)
+                chunk_count += len(chunks)
+        if skipped:
+            self.emit("skipped", skipped)
+        self.emit("response", chunk_count)
+    
+    def _generate_response(self):
+        started = time.perf_counter()
+        try:
+            prepared = self.prepare_chat()
+        except AttachmentError as e:
+            self.emit("error", str(e))
+            return
+        with tracer.span("payload build", "request", job_id=self.job.job_id):
+            fragments = prepared.message_fragments()
+            body = prepared.chat_body(fragments)
+        self.timings["preprocess_s"] = time.perf_counter() - started
+        
+        self.emit("prepared", sum(estimate_tokens(content) for content in prepared.estimate_contents()))
+        
+        if self.response_cache is not None and self.job.cache_mode:
+            self.cache_key = request_key(self.job.model, fragments, prepared.options(), prepared.attachment_digests)
+            if self.job.cache_mode == "use":
+                cached = self.response_cache.get(self.cache_key)
+                if cached is not None:
+                    self.emit("cache", True)
+                    self.emit("timings", dict(self.timings))
+                    self.emit("response", cached)
+                    return
+            self.emit("cache", False)
+        
+        self.request_started = time.perf_counter()
+        with tracer.span("http send", "network", path="chat", bytes=len(body.data)):
+            response = self.transport.post("chat", body, stream=self.stream)
+        del body
+        if response.status_code == 200:
+            if self.stream:
+                response_content, data = self._read_stream(response, lambda data: data.get("message", {}).get("content", ""))
+            else:
+                with tracer.span("decode", "network"):
+                    data = response.json()
+                response_content = data.get("message", {}).get("content", "No response")
+            
+            self._emit_stats(data)
+            self._emit_timings()
+            self._store_in_cache(response_content)
+            self.emit("response", response_content)
+        else:
+            error_text = response.text
+            try:
+                self._fallback_generate(prepared)
+            except Exception as e:
+                self.emit("error", f"API Error: {response.status_code} - {error_text}")
+    
+    def _fallback_generate(self, prepared):
+        """Fallback to the generate endpoint if chat endpoint is not available"""
+        context_prompt = prepared.generate_prompt(self.job.context)
+        self.emit("prepared", estimate_tokens(context_prompt))
+        with tracer.span("payload build", "request", job_id=self.job.job_id, fallback=True):
+            body = prepared.generate_body(self.job.context, context_prompt)
+        
+        if self.request_started is None:
+            self.request_started = time.perf_counter()
+        with tracer.span("http send", "network", path="generate", bytes=len(body.data)):
+            response = self.transport.post("generate", body, stream=self.stream)
+        if response.status_code == 200:
+            if self.stream:
+                response_content, data = self._read_stream(response, lambda data: data.get("response", ""))
+            else:
+                with tracer.span("decode", "network"):
+                    data = response.json()
+                response_content = data.get("response", "No response")
+            
+            if data.get("context"):
+                self.emit("context", data["context"])
+            
+            self._emit_stats(data)
+            self._emit_timings()
+            self._store_in_cache(response_content)
+            self.emit("response", response_content)
+        else:
+            self.emit("error", f"API Error: {response.status_code} - {response.text}")
+    
+    def _emit_stats(self, data):
+        stats = {key: data[key] for key in STAT_FIELDS if key in data}
+        if stats:
+            self.emit("stats", stats)
+    
+    def _emit_timings(self):
+        """Report the client-side split: preprocessing, time to first byte and the whole HTTP exchange"""
+        if self.request_started is not None:
+            self.timings["network_s"] = time.perf_counter() - self.request_started
+        self.emit("timings", dict(self.timings))
+    
+    def _store_in_cache(self, response_content):
+        # Partial answers from a cancelled generation must never be served later
+        if self.cache_key is None or self.cancel_event.is_set() or response_content == "No response":
+            return
+        self.response_cache.put(self.cache_key, self.job.model, response_content)
+    
+    def _read_stream(self, response, extract_text):
+        """Consume an NDJSON streaming response, emitting each text chunk as it arrives.
+        
+        Returns the full text and the final chunk, which carries the stats and context.
+        """
+        parts = []
+        data = {}
+        stream_started = time.perf_counter()
+        try:
+            for line in response.iter_lines():
+                if self.cancel_event.is_set():
+                    break
+                if not line:
+                    continue
+                
+                with tracer.span("decode", "network"):
+                    data = json.loads(line)
+                if "error" in data:
+                    raise RuntimeError(data["error"])
+                
+                chunk = extract_text(data)
+                if "ttfb_s" not in self.timings:
+                    first_byte = time.perf_counter()
+                    self.timings["ttfb_s"] = first_byte - self.request_started
+                    tracer.complete("ttfb", self.request_started, first_byte, "network", job_id=self.job.job_id)
+                if chunk:
+                    parts.append(chunk)
+                    self.emit("chunk", chunk)
+                
+                if data.get("done"):
+                    break
+        finally:
+            response.close()
+            tracer.complete("stream", stream_started, time.perf_counter(), "network", chunks=len(parts))
+        
+        return "".join(parts) or "No response", data if data.get("done") else {}
+    
+    def _preload_model(self):
+        """Load the model into memory without generating, so the first message skips the load time"""
+        payload = {"model": self.job.model}
+        if self.job.keep_alive is not None:
+            payload["keep_alive"] = self.job.keep_alive
+        
+        response = self.transport.post("generate", payload)
+        if response.status_code == 200:
+            self.emit("response", "")
+        else:
+            self.emit("error", f"Failed to load {self.job.model}: {response.status_code} - {response.text}")
+    
+    def _list_models(self):
+        try:
+            tag_models = self.transport.list_models()
+        except TransportError as e:
+            self.emit("error", str(e))
+            return
+        if self.catalog is not None:
+            # Only models that are new or whose digest changed need their details fetched again
+            for name in self.catalog.update_from_tags(tag_models):
+                show_response = self.transport.post("show", {"model": name})
+                if show_response.status_code == 200:
+                    self.catalog.apply_show(name, show_response.json())
+            self.catalog.save()
+        models = [model["name"] for model in tag_models]
+        self.emit("models", models)
@@ -0,0 +1,263 @@
+import json
+import os
+import threading
+import time
+
+from ollama_transport import DEFAULT_API_URL, OllamaTransport, TransportError
+
+
+# Statuses after which the same request is worth trying on another server
+FAILOVER_STATUSES = frozenset({500, 502, 503, 504})
+
+
+class Endpoint:
+    """One Ollama server, the models it has and how busy it is"""
+
+    def __init__(self, api_url, **transport_options):
+        self.transport = OllamaTransport(api_url, **transport_options)
+        self.api_url = self.transport.api_url
+        self.models = set()
+        self.in_flight = 0
+        self.healthy = True
+        self.failures = 0
+        self.retry_at = 0.0
+        self.latency = None
+
+    def available(self, now):
+        return self.healthy or now >= self.retry_at
+
+
+class _TrackedResponse:
+    """A streamed response that frees its server slot once the caller closes it"""
+
+    def __init__(self, response, release):
+        self._response = response
+        self._release = release
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def close(self):
+        try:
+            self._response.close()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class EndpointPool:
+    """Spreads requests over several Ollama servers.
+
+    Has the same get/post/list_models/close interface as OllamaTransport. Requests for a
+    model go to the least busy healthy server that has it (preferring the one that served
+    it last, which has it loaded), and fail over to the next one on connection errors and
+    5xx responses. A background thread re-reads every server's /api/tags to keep the
+    routing table and health flags current.
+
+    With several servers each one only retries once, since failing over is quicker than
+    retrying a busy server; a single server keeps the transport's own retry count.
+    """
+
+    def __init__(self, api_urls=(DEFAULT_API_URL,), health_interval=30.0, retry_after=10.0, retries=None,
+                 **transport_options):
+        if not api_urls:
+            raise ValueError("At least one endpoint is required")
+        if retries is None and len(api_urls) > 1:
+            retries = 1
+        if retries is not None:
+            transport_options["retries"] = retries
+        self.endpoints = [Endpoint(api_url, **transport_options) for api_url in api_urls]
+        self.health_interval = health_interval
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.last_served = {}
+        self.stopped = threading.Event()
+        self.health_thread = None
+
+    @property
+    def api_url(self):
+        return self.endpoints[0].api_url
+
+    def url(self, path):
+        return self.endpoints[0].transport.url(path)
+
+    def start_health_checks(self):
+        if self.health_thread is None and self.health_interval:
+            self.health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self.health_thread.start()
+
+    def stop_health_checks(self):
+        self.stopped.set()
+
+    def _health_loop(self):
+        while not self.stopped.wait(self.health_interval):
+            try:
+                self.list_models()
+            except Exception:
+                pass
+
+    def _candidates(self, model, pinned=False):
+        """Servers to try, best first"""
+        now = time.monotonic()
+        with self.lock:
+            endpoints = [endpoint for endpoint in self.endpoints if endpoint.available(now)]
+            if model:
+                with_model = [endpoint for endpoint in endpoints if model in endpoint.models]
+                endpoints = with_model or endpoints
+            warm = self.last_served.get(model)
+            if pinned and warm in endpoints:
+                # A generate context only means something to the server that produced it
+                return [warm] + [endpoint for endpoint in endpoints if endpoint is not warm]
+            return sorted(endpoints, key=lambda endpoint: (endpoint.in_flight, endpoint is not warm,
+                                                           endpoint.failures))
+
+    def _acquire(self, endpoint):
+        with self.lock:
+            endpoint.in_flight += 1
+
+    def _release(self, endpoint):
+        with self.lock:
+            endpoint.in_flight -= 1
+
+    def _succeeded(self, endpoint, model, latency):
+        with self.lock:
+            endpoint.healthy = True
+            endpoint.failures = 0
+            endpoint.latency = latency if endpoint.latency is None else 0.8 * endpoint.latency + 0.2 * latency
+            if model:
+                self.last_served[model] = endpoint
+
+    def _failed(self, endpoint):
+        with self.lock:
+            endpoint.healthy = False
+            endpoint.failures += 1
+            endpoint.retry_at = time.monotonic() + self.retry_after * min(endpoint.failures, 6)
+
+    def _request(self, model, send, stream=False, pinned=False):
+        import requests
+        candidates = self._candidates(model, pinned)
+        if not candidates:
+            # Every server is marked down; trying them all beats refusing outright
+            candidates = list(self.endpoints)
+        error = None
+        response = None
+        for endpoint in candidates:
+            self._acquire(endpoint)
+            started = time.perf_counter()
+            try:
+                response = send(endpoint.transport)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._release(endpoint)
+                self._failed(endpoint)
+                error = e
+                continue
+            if response.status_code in FAILOVER_STATUSES and endpoint is not candidates[-1]:
+                response.close()
+                self._release(endpoint)
+                self._failed(endpoint)
+                continue
+            self._succeeded(endpoint, model, time.perf_counter() - started)
+            if stream and response.status_code == 200:
+                return _TrackedResponse(response, lambda endpoint=endpoint: self._release(endpoint))
+            self._release(endpoint)
+            return response
+        if response is not None:
+            return response
+        raise error
+
+    def get(self, path, timeout=None):
+        return self._request(None, lambda transport: transport.get(path, timeout=timeout))
+
+    def post(self, path, payload, stream=False, timeout=None):
+        if hasattr(payload, "data"):
+            model, pinned = payload.model, payload.pinned
+        else:
+            model, pinned = payload.get("model"), "context" in payload
+        return self._request(model, lambda transport: transport.post(path, payload, stream=stream, timeout=timeout),
+                             stream=stream, pinned=pinned)
+
+    def list_models(self):
+        """Every server's models, merged; refreshes the routing table and health flags"""
+        import requests
+        results = [None] * len(self.endpoints)
+
+        def fetch(index, endpoint):
+            started = time.perf_counter()
+            try:
+                results[index] = endpoint.transport.list_models()
+            except (requests.RequestException, TransportError, ValueError) as e:
+                results[index] = e
+                self._failed(endpoint)
+            else:
+                self._succeeded(endpoint, None, time.perf_counter() - started)
+
+        threads = [threading.Thread(target=fetch, args=(index, endpoint), daemon=True)
+                   for index, endpoint in enumerate(self.endpoints)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        merged = {}
+        for endpoint, result in zip(self.endpoints, results):
+            if isinstance(result, Exception):
+                continue
+            with self.lock:
+                endpoint.models = {model["name"] for model in result}
+            for model in result:
+                merged.setdefault(model["name"], model)
+        if all(isinstance(result, Exception) for result in results):
+            error = results[0]
+            if isinstance(error, TransportError):
+                raise error
+            raise TransportError(f"Failed to fetch models: {error}")
+        return [merged[name] for name in sorted(merged)]
+
+    def status(self):
+        """(api_url, healthy, in_flight, model_count) per server"""
+        with self.lock:
+            return [(endpoint.api_url, endpoint.healthy, endpoint.in_flight, len(endpoint.models))
+                    for endpoint in self.endpoints]
+
+    def describe(self):
+        statuses = self.status()
+        if len(statuses) == 1:
+            return ""
+        healthy = sum(1 for _, is_healthy, _, _ in statuses if is_healthy)
+        return f"{healthy} of {len(statuses)} servers up"
+
+    def close(self):
+        self.stop_health_checks()
+        for endpoint in self.endpoints:
+            endpoint.transport.close()
+
+
+def normalize_api_url(url):
+    """Accept a bare host:port or server URL as well as the API base URL"""
+    url = url.strip().rstrip("/")
+    if "://" not in url:
+        url = f"http://{url}"
+    if not url.endswith("/api"):
+        url = f"{url}/api"
+    return url
+
+
+def load_endpoint_urls(path=None):
+    """Server list from OLLAMA_ENDPOINTS (comma separated), else from the saved file, else the local server"""
+    configured = os.environ.get("OLLAMA_ENDPOINTS", "")
+    urls = [normalize_api_url(url) for url in configured.split(",") if url.strip()]
+    if not urls and path:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                urls = [normalize_api_url(url) for url in json.load(file).get("endpoints", []) if url.strip()]
+        except (OSError, ValueError, AttributeError):
+            pass
+    return urls or [DEFAULT_API_URL]
+
+
+def save_endpoint_urls(path, urls):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"endpoints": list(urls)}, file, indent=2)
+    os.replace(temp_path, path)
@@ -0,0 +1,182 @@
+import csv
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+
+NANOSECONDS = 1e9
+
+# Columns of the exported history, in order
+METRIC_FIELDS = ("timestamp", "model", "cached", "tokens_per_s", "prompt_tokens_per_s", "ttft_s", "total_s",
+                 "load_s", "preprocess_s", "network_s", "render_s", "prompt_tokens", "eval_tokens",
+                 "prompt_eval_s", "eval_s", "server_total_s")
+
+
+def _seconds(stats, key):
+    value = stats.get(key)
+    return round(value / NANOSECONDS, 4) if value is not None else None
+
+
+def _rate(count, duration):
+    return round(count / (duration / NANOSECONDS), 2) if count and duration else None
+
+
+def build_entry(model, server_stats, client_timings, cached=False):
+    """Combine the server's final-chunk counters with the client's own timings into one record"""
+    entry = {
+        "timestamp": round(time.time(), 3),
+        "model": model,
+        "cached": cached,
+        "tokens_per_s": _rate(server_stats.get("eval_count"), server_stats.get("eval_duration")),
+        "prompt_tokens_per_s": _rate(server_stats.get("prompt_eval_count"), server_stats.get("prompt_eval_duration")),
+        "load_s": _seconds(server_stats, "load_duration"),
+        "prompt_tokens": server_stats.get("prompt_eval_count"),
+        "eval_tokens": server_stats.get("eval_count"),
+        "prompt_eval_s": _seconds(server_stats, "prompt_eval_duration"),
+        "eval_s": _seconds(server_stats, "eval_duration"),
+        "server_total_s": _seconds(server_stats, "total_duration"),
+    }
+    for key in ("ttft_s", "total_s", "preprocess_s", "network_s", "render_s"):
+        value = client_timings.get(key)
+        entry[key] = round(value, 4) if value is not None else None
+    return entry
+
+
+def format_readout(entry):
+    """Short status bar text for one request"""
+    if entry.get("cached"):
+        return f"{entry['model']}: cached answer in {entry['total_s']:.2f}s"
+    parts = [entry["model"]]
+    if entry.get("tokens_per_s"):
+        parts.append(f"{entry['tokens_per_s']:.1f} tokens/s")
+    if entry.get("ttft_s") is not None:
+        parts.append(f"TTFT {entry['ttft_s']:.2f}s")
+    if entry.get("load_s") is not None:
+        parts.append(f"load {entry['load_s']:.2f}s")
+    if entry.get("total_s") is not None:
+        parts.append(f"total {entry['total_s']:.2f}s")
+    return " · ".join(parts)
+
+
+class MetricsHistory:
+    """Rolling per-model history of request metrics, saved between runs"""
+
+    def __init__(self, path=None, max_per_model=500, cold_load_s=1.0):
+        self.path = path
+        self.max_per_model = max_per_model
+        self.cold_load_s = cold_load_s
+        self.lock = threading.Lock()
+        self.entries = {}
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                for entry in data.get("entries", []):
+                    self._append(entry)
+            except (OSError, ValueError):
+                pass
+
+    def _append(self, entry):
+        history = self.entries.get(entry["model"])
+        if history is None:
+            history = self.entries[entry["model"]] = deque(maxlen=self.max_per_model)
+        history.append(entry)
+
+    def record(self, entry):
+        with self.lock:
+            self._append(entry)
+
+    def models(self):
+        with self.lock:
+            return sorted(self.entries)
+
+    def history(self, model=None):
+        """Entries for one model, or for every model in time order"""
+        with self.lock:
+            if model is not None:
+                return list(self.entries.get(model, ()))
+            entries = [entry for history in self.entries.values() for entry in history]
+        return sorted(entries, key=lambda entry: entry["timestamp"])
+
+    def summary(self, model):
+        entries = [entry for entry in self.history(model) if not entry.get("cached")]
+        if not entries:
+            return None
+
+        def median(key):
+            values = [entry[key] for entry in entries if entry.get(key) is not None]
+            return statistics.median(values) if values else None
+
+        return {
+            "model": model,
+            "requests": len(entries),
+            "tokens_per_s": median("tokens_per_s"),
+            "ttft_s": median("ttft_s"),
+            "total_s": median("total_s"),
+            "cold_loads": sum(1 for entry in entries if (entry.get("load_s") or 0) >= self.cold_load_s),
+        }
+
+    def describe(self, model):
+        summary = self.summary(model)
+        if summary is None:
+            return ""
+        parts = [f"{model}: {summary['requests']} requests"]
+        if summary["tokens_per_s"] is not None:
+            parts.append(f"median {summary['tokens_per_s']:.1f} tokens/s")
+        if summary["ttft_s"] is not None:
+            parts.append(f"TTFT {summary['ttft_s']:.2f}s")
+        if summary["cold_loads"]:
+            parts.append(f"{summary['cold_loads']} cold loads")
+        return ", ".join(parts)
+
+    def export_csv(self, path):
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=METRIC_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(self.history())
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"entries": self.history()}, file, indent=2)
+
+    def export(self, path):
+        """Write the history as CSV or JSON depending on the file extension"""
+        if os.path.splitext(path)[1].lower() == ".json":
+            self.export_json(path)
+        else:
+            self.export_csv(path)
+
+    def save(self):
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"entries": self.history()}, file)
+        os.replace(temp_path, self.path)
+
+
+class StartupTimer:
+    """Named checkpoints from process start to the first interactive frame"""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def total_ms(self):
+        end = self.marks[-1][1] if self.marks else time.perf_counter()
+        return (end - self.started) * 1000
+
+    def report(self):
+        """Milliseconds spent in each phase (since the previous checkpoint) and in total"""
+        phases = {}
+        previous = self.started
+        for name, at in self.marks:
+            phases[name] = round((at - previous) * 1000, 1)
+            previous = at
+        return {"phases_ms": phases, "total_ms": round(self.total_ms(), 1)}
@@ -0,0 +1,237 @@
+"""A stand-in Ollama HTTP server for benchmarks and offline testing.
+
+    python -m ollama_mock_server --port 11434 --token-rate 40 --latency 0.2
+
+It answers /api/tags, /api/show, /api/chat, /api/generate and /api/embed with canned
+data, streaming NDJSON chunks at the configured token rate after the configured
+time to first token.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_MODELS = ("mock-small:latest", "mock-large:latest")
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate sends; with Nagle on, keep-alive requests would
+    # stall on the client's delayed ACK and the benchmarks would measure that instead
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+
+    def do_GET(self):
+        self.server.record(self.command, self.path, None)
+        if self.path == "/api/tags":
+            self._send_json({"models": [self._tag(name) for name in self.server.models]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-mock"})
+        elif self.path == "/api/ps":
+            self._send_json({"models": []})
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, 404)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.record(self.command, self.path, body)
+
+        if self.server.should_fail(self.path):
+            self._send_json({"error": "unavailable"}, self.server.fail_status)
+        elif self.path == "/api/show":
+            self._send_json({
+                "details": {"family": "mock", "parameter_size": "1B", "quantization_level": "Q4_0"},
+                "model_info": {"general.architecture": "mock", "mock.context_length": self.server.context_length},
+            })
+        elif self.path == "/api/embed":
+            inputs = body.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self._send_json({"model": body.get("model"), "embeddings": [self._embedding(text) for text in inputs]})
+        elif self.path in ("/api/chat", "/api/generate"):
+            self._generate(body, chat=self.path == "/api/chat")
+        else:
+            self._send_json({"error": f"unknown endpoint {self.path}"}, 404)
+
+    def _tag(self, name):
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return {
+            "name": name,
+            "model": name,
+            "digest": digest,
+            "size": 1_000_000_000,
+            "modified_at": "2024-01-01T00:00:00Z",
+            "details": {"family": "mock", "parameter_size": "1B", "quantization_level": "Q4_0"},
+        }
+
+    def _embedding(self, text):
+        digest = hashlib.sha256(text.encode()).digest()
+        return [(byte - 128) / 128 for byte in digest[:self.server.embedding_size]]
+
+    def _generate(self, body, chat):
+        if "prompt" not in body and "messages" not in body:
+            # A bare request only loads the model
+            self._send_json({"model": body.get("model"), "response": "", "done": True, "done_reason": "load"})
+            return
+
+        tokens = [f"tok{index} " for index in range(self.server.tokens)]
+        started = time.perf_counter()
+        time.sleep(self.server.latency)
+        stats = {
+            "total_duration": 0,
+            "load_duration": 0,
+            "prompt_eval_count": len(json.dumps(body)) // 4,
+            "prompt_eval_duration": int(self.server.latency * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(len(tokens) / self.server.token_rate * 1e9) if self.server.token_rate else 0,
+        }
+
+        def chunk(text, done):
+            data = {"model": body.get("model"), "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            if done:
+                stats["total_duration"] = int((time.perf_counter() - started) * 1e9)
+                data.update(stats)
+                if not chat:
+                    data["context"] = list(body.get("context", [])) + list(range(len(tokens)))
+            return data
+
+        if not body.get("stream", True):
+            if self.server.token_rate:
+                time.sleep(len(tokens) / self.server.token_rate)
+            self._send_json(chunk("".join(tokens), True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                self._write_chunk(chunk(token, False))
+                if self.server.token_rate:
+                    time.sleep(1 / self.server.token_rate)
+            self._write_chunk(chunk("", True))
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the generation
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        line = (json.dumps(data) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def _send_json(self, data, status=200):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, models=DEFAULT_MODELS, latency=0.0, token_rate=0.0,
+                 tokens=32, context_length=8192, embedding_size=16, fail_paths=(), fail_status=503, fail_count=None):
+        super().__init__((host, port), MockOllamaHandler)
+        self.models = list(models)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.context_length = context_length
+        self.embedding_size = embedding_size
+        self.fail_paths = set(fail_paths)
+        self.fail_status = fail_status
+        # None fails every request to fail_paths, a number only that many
+        self.fail_count = fail_count
+        self.connections = 0
+        self.requests = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def api_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def handle_error(self, request, client_address):
+        # Pooled client connections are simply dropped when the client exits
+        pass
+
+    def record(self, method, path, body):
+        with self.lock:
+            self.requests.append((method, path, body))
+
+    def count_connection(self):
+        with self.lock:
+            self.connections += 1
+
+    def should_fail(self, path):
+        with self.lock:
+            if path not in self.fail_paths or self.fail_count == 0:
+                return False
+            if self.fail_count is not None:
+                self.fail_count -= 1
+            return True
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ollama_mock_server", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="tokens per second (0 = as fast as possible)")
+    parser.add_argument("--tokens", type=int, default=32, help="tokens per response")
+    parser.add_argument("--model", action="append", help="model name to advertise (repeatable)")
+    args = parser.parse_args(argv)
+
+    server = MockOllamaServer(args.host, args.port, models=args.model or DEFAULT_MODELS, latency=args.latency,
+                              token_rate=args.token_rate, tokens=args.tokens)
+    print(f"Mock Ollama listening on {server.api_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+
+GENERATE_PREFIXES = {"user": "User: ", "assistant": "Assistant: ", "system": "System: "}
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+class MessageFragments:
+    """Serialized JSON of chat messages, kept so past turns are not encoded again every request.
+
+    Entries are keyed by (role, content); the history hands the same string objects back
+    turn after turn, so a lookup costs a hash that Python has already cached on the string.
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, role, content):
+        key = (role, content)
+        with self.lock:
+            fragment = self.entries.get(key)
+            if fragment is not None:
+                self.entries.move_to_end(key)
+                return fragment
+        fragment = _dumps({"role": role, "content": content})
+        with self.lock:
+            self.entries[key] = fragment
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return fragment
+
+
+message_fragments = MessageFragments()
+
+
+def _with_images(fragment, images):
+    """Append an "images" list to a serialized object; base64 needs no JSON escaping"""
+    if not images:
+        return fragment
+    return b"".join([fragment[:-1], b', "images": ["',
+                     b'", "'.join(image.encode("ascii") for image in images), b'"]}'])
+
+
+class JsonBody:
+    """An already serialized request body, plus the fields the transport routes on"""
+
+    def __init__(self, data, model=None, pinned=False):
+        self.data = data
+        self.model = model
+        self.pinned = pinned
+
+
+@dataclass
+class PreparedChat:
+    """Everything a chat turn sends, built once and shared by the chat and generate requests"""
+    model: str
+    instructions: str = None
+    history: tuple = ()
+    prompt: str = ""
+    attachment_text: str = ""
+    images: list = field(default_factory=list)
+    attachment_digests: list = field(default_factory=list)
+    keep_alive: str = None
+    stream: bool = True
+
+    def options(self):
+        return {"system": self.instructions} if self.instructions else {}
+
+    def user_content(self):
+        if self.attachment_text:
+            return "".join((self.prompt, "\n", self.attachment_text))
+        return self.prompt
+
+    def message_fragments(self):
+        """Serialized system and history messages, followed by the new user turn (without images)"""
+        fragments = []
+        if self.instructions:
+            fragments.append(message_fragments.get("system", self.instructions))
+        fragments.extend(message_fragments.get(role, content) for role, content in self.history)
+        fragments.append(_dumps({"role": "user", "content": self.user_content()}))
+        return fragments
+
+    def estimate_contents(self):
+        """The texts that make up the prompt, for token estimates"""
+        contents = [self.instructions] if self.instructions else []
+        contents.extend(content for _, content in self.history)
+        contents.append(self.prompt)
+        if self.attachment_text:
+            contents.append(self.attachment_text)
+        return contents
+
+    def _envelope(self, body_parts):
+        parts = [b'{"model": ', _dumps(self.model)]
+        parts.extend(body_parts)
+        parts.append(b', "stream": true' if self.stream else b', "stream": false')
+        parts.extend((b', "options": ', _dumps(self.options())))
+        if self.keep_alive is not None:
+            parts.extend((b', "keep_alive": ', _dumps(self.keep_alive)))
+        return parts
+
+    def chat_body(self, fragments=None):
+        """The /api/chat request body, joined from the cached message fragments"""
+        fragments = list(fragments or self.message_fragments())
+        fragments[-1] = _with_images(fragments[-1], self.images)
+        parts = self._envelope([b', "messages": [', b", ".join(fragments), b"]"])
+        parts.append(b"}")
+        return JsonBody(b"".join(parts), self.model)
+
+    def generate_prompt(self, context=()):
+        prompt_parts = []
+        # With the context returned by the previous turn the server already holds the
+        # transcript in its KV cache, so only the new turn has to be evaluated
+        if not context:
+            if self.instructions:
+                prompt_parts.append(f"System: {self.instructions}\n\n")
+            for role, content in self.history:
+                prompt_parts.extend((GENERATE_PREFIXES.get(role, "User: "), content, "\n\n"))
+        if self.instructions:
+            prompt_parts.append(f"IMPORTANT INSTRUCTION: {self.instructions}\n\n")
+        prompt_parts.extend(("User: ", self.prompt))
+        if self.attachment_text:
+            prompt_parts.extend(("\n", self.attachment_text))
+        prompt_parts.append("\n\nAssistant:")
+        return "".join(prompt_parts)
+
+    def generate_body(self, context=(), prompt=None):
+        """The /api/generate request body, for servers without /api/chat"""
+        if prompt is None:
+            prompt = self.generate_prompt(context)
+        prompt = _with_images(_dumps({"prompt": prompt}), self.images)
+        parts = self._envelope([b", ", prompt[1:-1]])
+        if context:
+            parts.extend((b', "context": ', _dumps(list(context))))
+        parts.append(b"}")
+        return JsonBody(b"".join(parts), self.model, pinned=bool(context))
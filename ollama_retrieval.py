@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+DEFAULT_EMBED_MODEL = "nomic-embed-text"
+
+
+@dataclass(frozen=True)
+class RetrievalSettings:
+    """Retrieval mode: only the top_k chunks most similar to the prompt are sent instead of whole documents"""
+    embed_model: str = DEFAULT_EMBED_MODEL
+    top_k: int = 6
+    chunk_chars: int = 1500
+    overlap_chars: int = 200
+
+
+@dataclass(frozen=True)
+class Chunk:
+    label: str
+    text: str
+
+
+def chunk_text(text, chunk_chars=1500, overlap_chars=200):
+    """Split text into overlapping pieces, preferring paragraph and sentence boundaries"""
+    text = text.strip()
+    if len(text) <= chunk_chars:
+        return [text] if text else []
+    chunks = []
+    start = 0
+    while start < len(text):
+        stop = min(start + chunk_chars, len(text))
+        if stop < len(text):
+            window = text[start:stop]
+            for separator in ("\n\n", "\n", ". ", " "):
+                cut = window.rfind(separator)
+                if cut > chunk_chars // 2:
+                    stop = start + cut + len(separator)
+                    break
+        chunk = text[start:stop].strip()
+        if chunk:
+            chunks.append(chunk)
+        if stop >= len(text):
+            break
+        start = max(stop - overlap_chars, start + 1)
+        # Start the overlap on a word boundary
+        space = text.find(" ", start, stop)
+        if space != -1:
+            start = space + 1
+    return chunks
+
+
+def chunk_attachment(attachment, settings):
+    """Chunks of an ExtractedAttachment, labelled with the page they come from"""
+    if not attachment.paged:
+        texts = chunk_text("".join(attachment.pages), settings.chunk_chars, settings.overlap_chars)
+        return [Chunk(f"Part {number}", text) for number, text in enumerate(texts, 1)]
+    chunks = []
+    for page_number, page_text in enumerate(attachment.pages, 1):
+        for text in chunk_text(page_text or "", settings.chunk_chars, settings.overlap_chars):
+            chunks.append(Chunk(f"Page {page_number}", text))
+    return chunks
+
+
+class DocumentIndex:
+    """Chunk embeddings on disk, one .npy matrix per (document hash, embedding model)"""
+
+    def __init__(self, directory, max_loaded=16):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.loaded = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _base_path(self, digest, embed_model):
+        model_tag = re.sub(r"[^A-Za-z0-9_.-]", "_", embed_model)
+        key_tag = hashlib.sha256(f"{digest}:{embed_model}".encode()).hexdigest()[:24]
+        return os.path.join(self.directory, f"{key_tag}-{model_tag}")
+
+    def get(self, digest, embed_model):
+        """(chunks, vectors) for an indexed document, or None"""
+        import numpy as np
+        key = (digest, embed_model)
+        with self.lock:
+            entry = self.loaded.get(key)
+            if entry is not None:
+                self.loaded.move_to_end(key)
+                return entry
+        base_path = self._base_path(digest, embed_model)
+        try:
+            with open(f"{base_path}.json", "r", encoding="utf-8") as file:
+                chunks = [Chunk(label, text) for label, text in json.load(file)["chunks"]]
+            # Memory-mapped so that a large document costs no RAM until it is searched
+            vectors = np.load(f"{base_path}.npy", mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            return None
+        entry = (chunks, vectors)
+        with self.lock:
+            self.loaded[key] = entry
+            while len(self.loaded) > self.max_loaded:
+                self.loaded.popitem(last=False)
+        return entry
+
+    def put(self, digest, embed_model, chunks, vectors):
+        import numpy as np
+        base_path = self._base_path(digest, embed_model)
+        with open(f"{base_path}.npy.tmp", "wb") as file:
+            np.save(file, vectors)
+        with open(f"{base_path}.json.tmp", "w", encoding="utf-8") as file:
+            json.dump({"digest": digest, "embed_model": embed_model,
+                       "chunks": [(chunk.label, chunk.text) for chunk in chunks]}, file)
+        # The matrix goes in place first; get() only trusts a pair once the chunk list exists
+        os.replace(f"{base_path}.npy.tmp", f"{base_path}.npy")
+        os.replace(f"{base_path}.json.tmp", f"{base_path}.json")
+        with self.lock:
+            self.loaded[(digest, embed_model)] = (chunks, vectors)
+
+
+class Retriever:
+    """Embeds documents through /api/embed and picks the chunks closest to a prompt"""
+
+    def __init__(self, transport, index, settings, batch_size=32, cancel_event=None):
+        self.transport = transport
+        self.index = index
+        self.settings = settings
+        self.batch_size = batch_size
+        self.cancel_event = cancel_event
+
+    def embed(self, texts):
+        import numpy as np
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise RuntimeError("Embedding cancelled")
+            batch = texts[start:start + self.batch_size]
+            response = self.transport.post("embed", {"model": self.settings.embed_model, "input": batch})
+            if response.status_code != 200:
+                raise RuntimeError(f"Embedding with {self.settings.embed_model} failed: "
+                                   f"{response.status_code} - {response.text}")
+            vectors.extend(response.json()["embeddings"])
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def ensure_indexed(self, attachment):
+        """Chunks and vectors for an attachment, embedding it on first use"""
+        entry = self.index.get(attachment.digest, self.settings.embed_model)
+        if entry is not None:
+            return entry
+        chunks = chunk_attachment(attachment, self.settings)
+        if chunks:
+            vectors = self.embed([chunk.text for chunk in chunks])
+        else:
+            import numpy as np
+            vectors = np.zeros((0, 0), dtype=np.float32)
+        self.index.put(attachment.digest, self.settings.embed_model, chunks, vectors)
+        return chunks, vectors
+
+    def excerpts(self, prompt, documents):
+        """Render the top-k chunks across documents for the prompt.
+
+        documents is a list of (file_name, attachment). Returns (text, used_chunks, total_chunks);
+        a document small enough to fit in the top-k budget is inlined whole.
+        """
+        import numpy as np
+        top_k = self.settings.top_k
+        indexed = []
+        for file_name, attachment in documents:
+            chunks, vectors = self.ensure_indexed(attachment)
+            indexed.append((file_name, attachment, chunks, vectors))
+        total = sum(len(chunks) for _, _, chunks, _ in indexed)
+        large = [position for position, entry in enumerate(indexed) if len(entry[2]) > top_k]
+
+        selected = {}
+        if large:
+            query = self.embed([prompt])[0]
+            scored = []
+            for position in large:
+                scores = np.asarray(indexed[position][3]) @ query
+                best = np.argpartition(-scores, top_k)[:top_k]
+                scored.extend((float(scores[row]), position, int(row)) for row in best)
+            scored.sort(reverse=True)
+            for _, position, row in scored[:top_k]:
+                selected.setdefault(position, []).append(row)
+
+        parts = []
+        used = 0
+        for position, (file_name, attachment, chunks, _) in enumerate(indexed):
+            if len(chunks) <= top_k:
+                parts.append(attachment.render(file_name))
+                used += len(chunks)
+                continue
+            rows = sorted(selected.get(position, ()))
+            if not rows:
+                continue
+            # Excerpts keep document order so the model reads them in context
+            parts.append(f"\n\n--- Relevant excerpts from {file_name} ---\n")
+            for row in rows:
+                parts.append(f"\n-- {chunks[row].label} --\n{chunks[row].text}\n")
+            used += len(rows)
+        return "".join(parts), used, total
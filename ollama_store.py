@@ -0,0 +1,121 @@
+import sqlite3
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at DESC);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (content, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+class ConversationStore:
+    """SQLite-backed conversation history, written one message at a time"""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; search falls back to a LIKE scan
+            self.full_text = False
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def create_session(self, title, model=None):
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO sessions (title, model, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (title, model, now, now))
+        return cursor.lastrowid
+
+    def delete_session(self, session_id):
+        with self.connection:
+            self.connection.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self.connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def add_message(self, session_id, role, content, model=None):
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, now))
+            self.connection.execute(
+                "UPDATE sessions SET updated_at = ?, model = COALESCE(?, model) WHERE id = ?",
+                (now, model, session_id))
+        return cursor.lastrowid
+
+    def list_sessions(self, limit=200):
+        """Most recently used sessions as (id, title, model, updated_at) rows"""
+        return self.connection.execute(
+            "SELECT id, title, model, updated_at FROM sessions ORDER BY updated_at DESC LIMIT ?",
+            (limit,)).fetchall()
+
+    def session(self, session_id):
+        return self.connection.execute(
+            "SELECT id, title, model, updated_at FROM sessions WHERE id = ?", (session_id,)).fetchone()
+
+    def recent_messages(self, session_id, limit=50, before_id=None):
+        """A page of (id, role, content) rows in chronological order, ending just before before_id"""
+        if before_id is None:
+            rows = self.connection.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, limit)).fetchall()
+        else:
+            rows = self.connection.execute(
+                "SELECT id, role, content FROM messages WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (session_id, before_id, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    def search(self, query, limit=50):
+        """Find messages matching query as (session_id, message_id, title, snippet) rows"""
+        terms = query.split()
+        if not terms:
+            return []
+        if self.full_text:
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+            return self.connection.execute(
+                "SELECT m.session_id, m.id, s.title, snippet(messages_fts, 0, '', '', '...', 12) "
+                "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                "JOIN sessions s ON s.id = m.session_id "
+                "WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, limit)).fetchall()
+
+        clauses = " AND ".join("m.content LIKE ?" for _ in terms)
+        rows = self.connection.execute(
+            "SELECT m.session_id, m.id, s.title, m.content FROM messages m "
+            f"JOIN sessions s ON s.id = m.session_id WHERE {clauses} ORDER BY m.id DESC LIMIT ?",
+            [f"%{term}%" for term in terms] + [limit]).fetchall()
+        return [(session_id, message_id, title, content[:120]) for session_id, message_id, title, content in rows]
@@ -0,0 +1,130 @@
+"""Request lifecycle tracing in the Chrome trace event format.
+
+Enable it with OLLAMA_UI_TRACE=trace.json (or --trace trace.json) and open the file in
+https://ui.perfetto.dev or chrome://tracing. OLLAMA_UI_PROFILE=run.prof (or --profile run.prof)
+additionally runs the main (UI) thread under cProfile.
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+class Tracer:
+    """Collects named spans from every thread; does nothing until enabled"""
+
+    def __init__(self, max_events=200000):
+        self.enabled = False
+        self.max_events = max_events
+        self.events = []
+        self.thread_names = {}
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+
+    def _thread_name(self, thread):
+        # Threads started outside the threading module (Qt's pool) only get a placeholder name
+        return f"worker {thread.ident}" if thread.name.startswith("Dummy") else thread.name
+
+    def _timestamp(self, at):
+        return round((at - self.origin) * 1e6, 1)
+
+    def complete(self, name, started, finished, category="app", **args):
+        """Record a span whose start and end were measured elsewhere, possibly on different threads"""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                 "ts": self._timestamp(started), "dur": round((finished - started) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self.lock:
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            self.thread_names.setdefault(thread.ident, self._thread_name(thread))
+
+    def span(self, name, category="app", **args):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._span(name, category, args)
+
+    @contextlib.contextmanager
+    def _span(self, name, category, args):
+        started = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.complete(name, started, time.perf_counter(), category, **args)
+
+    def instant(self, name, category="app", **args):
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "i", "s": "t", "pid": os.getpid(), "tid": thread.ident,
+                 "ts": self._timestamp(time.perf_counter())}
+        if args:
+            event["args"] = args
+        with self.lock:
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            self.thread_names.setdefault(thread.ident, self._thread_name(thread))
+
+    def trace_events(self):
+        with self.lock:
+            events = list(self.events)
+            thread_names = dict(self.thread_names)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": name}}
+                    for ident, name in thread_names.items()]
+        return metadata + sorted(events, key=lambda event: event["ts"])
+
+    def save(self, path):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, file)
+        os.replace(temp_path, path)
+
+
+tracer = Tracer()
+
+
+def traced(name, category="app"):
+    """Decorator recording each call of a function as a span"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.span(name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def profiled(path):
+    """Run the enclosed code under cProfile and write the stats (for pstats or snakeviz) to path"""
+    if not path:
+        yield
+        return
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+
+
+def option_value(argv, flag):
+    """The value of "--flag value" or "--flag=value" in argv, or None"""
+    for index, argument in enumerate(argv):
+        if argument == flag and index + 1 < len(argv):
+            return argv[index + 1]
+        if argument.startswith(f"{flag}="):
+            return argument[len(flag) + 1:]
+    return None
@@ -0,0 +1,215 @@
+import itertools
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import QApplication, QListView, QStyledItemDelegate, QStyle, QAbstractItemView
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRectF
+from PyQt6.QtGui import QAction, QKeySequence, QTextDocument, QTextCursor, QTextCharFormat, QTextOption
+
+
+ROLE_PREFIXES = {"system": "System: ", "user": "You: ", "assistant": "AI: "}
+MessageRole = Qt.ItemDataRole.UserRole + 1
+
+_message_ids = itertools.count(1)
+
+
+class ChatMessage:
+    __slots__ = ("uid", "role", "text", "tag", "revision")
+
+    def __init__(self, role, text, tag=""):
+        self.uid = next(_message_ids)
+        self.role = role
+        self.text = text
+        self.tag = tag
+        self.revision = 0
+
+    def prefix(self):
+        prefix = ROLE_PREFIXES.get(self.role, "")
+        if self.tag:
+            prefix = f"{prefix[:-2]} [{self.tag}]: "
+        return prefix
+
+    def display_text(self):
+        return f"{self.prefix()}{self.text}"
+
+
+class TranscriptModel(QAbstractListModel):
+    """The chat transcript as a list of message records; views only lay out the rows they show"""
+
+    def __init__(self, max_messages=5000, parent=None):
+        super().__init__(parent)
+        self.max_messages = max_messages
+        self.messages = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.messages)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        message = self.messages[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return message.display_text()
+        if role == MessageRole:
+            return message
+        return None
+
+    def add_message(self, role, text, tag=""):
+        row = len(self.messages)
+        self.beginInsertRows(QModelIndex(), row, row)
+        message = ChatMessage(role, text, tag)
+        self.messages.append(message)
+        self.endInsertRows()
+        self._trim()
+        return message
+
+    def prepend_messages(self, records):
+        """Insert older (role, text) records above the current rows"""
+        if not records:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(records) - 1)
+        self.messages[0:0] = [ChatMessage(role, text) for role, text in records]
+        self.endInsertRows()
+
+    def append_text(self, message, text):
+        message.text += text
+        message.revision += 1
+        row = self.row_of(message)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def row_of(self, message):
+        # Updates almost always target one of the last rows, so search backwards
+        for row in range(len(self.messages) - 1, -1, -1):
+            if self.messages[row] is message:
+                return row
+        return -1
+
+    def clear(self):
+        self.beginResetModel()
+        self.messages = []
+        self.endResetModel()
+
+    def _trim(self):
+        excess = len(self.messages) - self.max_messages
+        if excess > 0:
+            self.beginRemoveRows(QModelIndex(), 0, excess - 1)
+            del self.messages[:excess]
+            self.endRemoveRows()
+
+
+class MessageDelegate(QStyledItemDelegate):
+    """Paints a message as a colored role prefix followed by word-wrapped text"""
+
+    MARGIN = 6
+
+    def __init__(self, role_color, text_color, parent=None):
+        super().__init__(parent)
+        self.role_color = role_color
+        self.text_color = text_color
+        self.documents = OrderedDict()
+        self.max_documents = 256
+
+    def restyle(self):
+        self.documents.clear()
+
+    def _document(self, message, font, width):
+        key = (message.uid, message.revision, width)
+        document = self.documents.get(key)
+        if document is not None:
+            self.documents.move_to_end(key)
+            return document
+
+        document = QTextDocument()
+        document.setDefaultFont(font)
+        document.setDocumentMargin(0)
+        text_option = QTextOption()
+        text_option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+        document.setDefaultTextOption(text_option)
+        document.setTextWidth(width)
+
+        cursor = QTextCursor(document)
+        prefix_format = QTextCharFormat()
+        prefix_format.setForeground(self.role_color(message.role))
+        if message.role == "system":
+            cursor.insertText(message.display_text(), prefix_format)
+        else:
+            cursor.insertText(message.prefix(), prefix_format)
+            message_format = QTextCharFormat()
+            message_format.setForeground(self.text_color())
+            cursor.insertText(message.text, message_format)
+
+        self.documents[key] = document
+        while len(self.documents) > self.max_documents:
+            self.documents.popitem(last=False)
+        return document
+
+    def _text_width(self, option):
+        view = self.parent()
+        width = view.viewport().width() if view is not None else option.rect.width()
+        return max(50, width - 2 * self.MARGIN)
+
+    def sizeHint(self, option, index):
+        message = index.data(MessageRole)
+        document = self._document(message, option.font, self._text_width(option))
+        return QSize(int(document.textWidth()) + 2 * self.MARGIN, int(document.size().height()) + 2 * self.MARGIN)
+
+    def paint(self, painter, option, index):
+        message = index.data(MessageRole)
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight().color().lighter(160)
+                             if option.palette.base().color().lightness() > 127
+                             else option.palette.highlight().color().darker(160))
+        document = self._document(message, option.font, self._text_width(option))
+        painter.save()
+        painter.translate(option.rect.left() + self.MARGIN, option.rect.top() + self.MARGIN)
+        document.drawContents(painter, QRectF(0, 0, document.textWidth(), document.size().height()))
+        painter.restore()
+
+
+class TranscriptView(QListView):
+    def __init__(self, role_color, text_color, parent=None, max_messages=5000):
+        super().__init__(parent)
+        self.transcript = TranscriptModel(max_messages, parent=self)
+        self.delegate = MessageDelegate(role_color, text_color, self)
+        self.setModel(self.transcript)
+        self.setItemDelegate(self.delegate)
+        self.setWordWrap(True)
+        self.setUniformItemSizes(False)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+
+        copy_action = QAction("Copy", self)
+        copy_action.setShortcut(QKeySequence.StandardKey.Copy)
+        copy_action.triggered.connect(self.copy_selection)
+        self.addAction(copy_action)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+
+    def add_message(self, role, text, tag=""):
+        message = self.transcript.add_message(role, text, tag)
+        self.scrollToBottom()
+        return message
+
+    def append_text(self, message, text):
+        self.transcript.append_text(message, text)
+        self.scrollToBottom()
+
+    def clear(self):
+        self.transcript.clear()
+        self.delegate.restyle()
+
+    def restyle(self):
+        """Apply a palette change by dropping the cached layouts and repainting the visible rows"""
+        self.delegate.restyle()
+        self.scheduleDelayedItemsLayout()
+        self.viewport().update()
+
+    def copy_selection(self):
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        text = "\n\n".join(self.transcript.messages[row].display_text() for row in rows)
+        if text:
+            QApplication.clipboard().setText(text)
@@ -0,0 +1,132 @@
+import socket
+import threading
+import weakref
+
+
+DEFAULT_API_URL = "http://localhost:11434/api"
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class TransportError(Exception):
+    """The server answered, but not with what was asked for"""
+
+
+class OllamaTransport:
+    """Pooled HTTP session shared by every call to the Ollama API.
+
+    The session (and requests itself, which is slow to import) is only set up on the
+    first call, which normally happens on a worker thread rather than during startup.
+    close() also shuts down the sockets of requests still in progress, so threads blocked
+    waiting for a slow server return straight away instead of after the read timeout.
+    """
+
+    def __init__(self, api_url=DEFAULT_API_URL, connect_timeout=5.0, read_timeout=300.0,
+                 retries=3, backoff_factor=0.5, pool_size=8):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self._session = None
+        self.closed = False
+        self.active_connections = weakref.WeakSet()
+        self.lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self.lock:
+            if self.closed:
+                raise TransportError("The connection to the server was closed")
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+        from urllib3.util.retry import Retry
+
+        lock = self.lock
+        active_connections = self.active_connections
+
+        class TrackingPool:
+            """Remembers which connections are checked out, i.e. carrying a request"""
+
+            def _get_conn(self, timeout=None):
+                conn = super()._get_conn(timeout)
+                with lock:
+                    active_connections.add(conn)
+                return conn
+
+            def _put_conn(self, conn):
+                if conn is not None:
+                    with lock:
+                        active_connections.discard(conn)
+                super()._put_conn(conn)
+
+        pool_classes = {
+            "http": type("TrackingHTTPConnectionPool", (TrackingPool, HTTPConnectionPool), {}),
+            "https": type("TrackingHTTPSConnectionPool", (TrackingPool, HTTPSConnectionPool), {}),
+        }
+
+        class TrackingAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = pool_classes
+
+        # Connection errors are retried for every method since the request never reached
+        # the server; busy/unavailable statuses are retried with exponential backoff.
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,
+            status=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD", "POST"}),
+            raise_on_status=False,
+        )
+        adapter = TrackingAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def url(self, path):
+        return f"{self.api_url}/{path.lstrip('/')}"
+
+    def get(self, path, timeout=None):
+        return self.session.get(self.url(path), timeout=timeout or self.timeout)
+
+    def post(self, path, payload, stream=False, timeout=None):
+        """POST a payload dict, or a body that was serialized ahead of time (ollama_payload.JsonBody)"""
+        if hasattr(payload, "data"):
+            return self.session.post(self.url(path), data=payload.data, headers=JSON_HEADERS, stream=stream,
+                                     timeout=timeout or self.timeout)
+        return self.session.post(self.url(path), json=payload, stream=stream, timeout=timeout or self.timeout)
+
+    def list_models(self):
+        """The models in /api/tags"""
+        response = self.get("tags")
+        if response.status_code != 200:
+            raise TransportError(f"Failed to fetch models: {response.status_code} - {response.text}")
+        return response.json().get("models", [])
+
+    def close(self):
+        with self.lock:
+            session, self._session = self._session, None
+            self.closed = True
+            connections = list(self.active_connections)
+        if session is not None:
+            # Closes the idle connections and stops retries from opening new ones
+            session.close()
+        for conn in connections:
+            sock = getattr(conn, "sock", None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
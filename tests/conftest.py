@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ollama_mock_server import MockOllamaServer
+
+
+@pytest.fixture
+def mock_server():
+    """Start a MockOllamaServer with the given options; every server is stopped after the test"""
+    servers = []
+
+    def start(**options):
+        server = MockOllamaServer("127.0.0.1", **options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def down_url(mock_server):
+    """The API URL of a server that has been shut down, so connections are refused"""
+    server = mock_server()
+    api_url = server.api_url
+    server.stop()
+    return api_url
@@ -0,0 +1,34 @@
+from ollama_context import ContextWindow
+
+
+def conversation(context, label, count):
+    for index in range(count):
+        context.append("user", f"{label} {index}")
+
+
+def test_summary_is_applied_to_the_conversation_it_was_written_for():
+    context = ContextWindow(summarize=True)
+    conversation(context, "old convo", 6)
+    generation = context.generation
+
+    context.apply_summary("summary of OLD conversation", 4, generation)
+
+    assert context.summarized_count == 4
+    history, _, _ = context.select("model", "next")
+    assert history[0] == ("system", "Summary of the earlier conversation: summary of OLD conversation")
+    assert history[1] == ("user", "old convo 4")
+
+
+def test_summary_finishing_after_a_conversation_switch_is_ignored():
+    context = ContextWindow(summarize=True)
+    conversation(context, "old convo", 6)
+    generation = context.generation
+
+    context.clear()
+    conversation(context, "new convo", 6)
+    context.apply_summary("summary of OLD conversation", 4, generation)
+
+    assert context.summary is None
+    assert context.summarized_count == 0
+    history, _, _ = context.select("model", "next")
+    assert history == tuple(("user", f"new convo {index}") for index in range(6))
@@ -0,0 +1,94 @@
+import pytest
+
+from ollama_endpoints import EndpointPool, normalize_api_url
+
+
+def chat_payload(model):
+    return {"model": model, "messages": [{"role": "user", "content": "hi"}], "stream": False}
+
+
+def chat_requests(server):
+    return [body["model"] for _, path, body in server.requests if path == "/api/chat"]
+
+
+@pytest.fixture
+def pools():
+    created = []
+
+    def create(api_urls, **options):
+        options.setdefault("backoff_factor", 0)
+        pool = EndpointPool(api_urls, health_interval=0, **options)
+        created.append(pool)
+        return pool
+
+    yield create
+    for pool in created:
+        pool.close()
+
+
+def test_model_is_routed_to_the_server_that_lists_it(mock_server, pools):
+    first = mock_server(models=["alpha:latest"])
+    second = mock_server(models=["beta:latest"])
+    pool = pools([first.api_url, second.api_url])
+    assert [model["name"] for model in pool.list_models()] == ["alpha:latest", "beta:latest"]
+
+    for _ in range(3):
+        assert pool.post("chat", chat_payload("beta:latest")).status_code == 200
+    assert pool.post("chat", chat_payload("alpha:latest")).status_code == 200
+
+    assert chat_requests(first) == ["alpha:latest"]
+    assert chat_requests(second) == ["beta:latest"] * 3
+
+
+def test_failover_past_a_busy_and_a_down_server(mock_server, down_url, pools):
+    busy = mock_server(fail_paths={"/api/chat"}, fail_status=503)
+    healthy = mock_server()
+    pool = pools([down_url, busy.api_url, healthy.api_url])
+
+    response = pool.post("chat", chat_payload("mock-small:latest"))
+
+    assert response.status_code == 200
+    assert chat_requests(busy) and chat_requests(healthy) == ["mock-small:latest"]
+    statuses = {api_url: healthy_flag for api_url, healthy_flag, _, _ in pool.status()}
+    assert statuses == {down_url: False, busy.api_url: False, healthy.api_url: True}
+    assert pool.describe() == "1 of 3 servers up"
+
+
+def test_list_models_skips_a_down_server(mock_server, down_url, pools):
+    server = mock_server(models=["alpha:latest"])
+    pool = pools([down_url, server.api_url])
+    assert [model["name"] for model in pool.list_models()] == ["alpha:latest"]
+
+
+def test_streamed_response_holds_its_slot_until_closed(mock_server, pools):
+    server = mock_server()
+    pool = pools([server.api_url])
+    endpoint = pool.endpoints[0]
+
+    response = pool.post("chat", dict(chat_payload("mock-small:latest"), stream=True), stream=True)
+    assert response.status_code == 200
+    assert endpoint.in_flight == 1
+    assert b"".join(response.iter_lines())
+    response.close()
+    assert endpoint.in_flight == 0
+    # Closing twice must not release the slot twice
+    response.close()
+    assert endpoint.in_flight == 0
+
+    pool.post("chat", chat_payload("mock-small:latest"))
+    assert endpoint.in_flight == 0
+
+
+def test_single_server_keeps_the_transport_retries(pools):
+    assert pools(["http://127.0.0.1:1/api"]).endpoints[0].transport.retries == 3
+    pool = pools(["http://127.0.0.1:1/api", "http://127.0.0.1:2/api"])
+    assert [endpoint.transport.retries for endpoint in pool.endpoints] == [1, 1]
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("localhost:11434", "http://localhost:11434/api"),
+    ("http://gpu-box:11434/", "http://gpu-box:11434/api"),
+    ("https://ollama.example/api", "https://ollama.example/api"),
+])
+def test_normalize_api_url(url, expected):
+    assert normalize_api_url(url) == expected
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from ollama_transport import OllamaTransport, TransportError
+
+
+def chat_payload(model="mock-small:latest"):
+    return {"model": model, "messages": [{"role": "user", "content": "hi"}], "stream": False}
+
+
+def chat_requests(server):
+    return [path for _, path, _ in server.requests if path == "/api/chat"]
+
+
+def test_list_models_and_post(mock_server):
+    server = mock_server()
+    transport = OllamaTransport(server.api_url)
+    try:
+        assert [model["name"] for model in transport.list_models()] == server.models
+        response = transport.post("chat", chat_payload())
+        assert response.status_code == 200
+        assert response.json()["done"]
+    finally:
+        transport.close()
+
+
+def test_connection_is_reused_across_calls(mock_server):
+    server = mock_server()
+    transport = OllamaTransport(server.api_url)
+    try:
+        for _ in range(5):
+            transport.get("tags")
+            transport.post("chat", chat_payload())
+    finally:
+        transport.close()
+    assert server.connections == 1
+
+
+@pytest.mark.parametrize("status", [502, 503, 504])
+def test_busy_statuses_are_retried(mock_server, status):
+    server = mock_server(fail_paths={"/api/chat"}, fail_status=status, fail_count=2)
+    transport = OllamaTransport(server.api_url, retries=3, backoff_factor=0)
+    try:
+        response = transport.post("chat", chat_payload())
+    finally:
+        transport.close()
+    assert response.status_code == 200
+    assert len(chat_requests(server)) == 3
+
+
+def test_last_busy_response_is_returned_when_retries_run_out(mock_server):
+    server = mock_server(fail_paths={"/api/chat"}, fail_status=503)
+    transport = OllamaTransport(server.api_url, retries=2, backoff_factor=0)
+    try:
+        response = transport.post("chat", chat_payload())
+    finally:
+        transport.close()
+    assert response.status_code == 503
+    assert len(chat_requests(server)) == 3
+
+
+def test_server_errors_are_not_retried(mock_server):
+    server = mock_server(fail_paths={"/api/chat"}, fail_status=500)
+    transport = OllamaTransport(server.api_url, retries=3, backoff_factor=0)
+    try:
+        assert transport.post("chat", chat_payload()).status_code == 500
+    finally:
+        transport.close()
+    assert len(chat_requests(server)) == 1
+
+
+def test_read_timeout(mock_server):
+    server = mock_server(latency=2.0)
+    transport = OllamaTransport(server.api_url, read_timeout=0.2, backoff_factor=0)
+    started = time.perf_counter()
+    try:
+        with pytest.raises((requests.Timeout, requests.ConnectionError)):
+            transport.post("chat", chat_payload())
+    finally:
+        transport.close()
+    assert time.perf_counter() - started < 1.5
+    # A request that may have reached the server is never sent twice
+    assert len(chat_requests(server)) == 1
+
+
+def test_refused_connection_raises_after_retries(down_url):
+    transport = OllamaTransport(down_url, retries=2, backoff_factor=0)
+    try:
+        with pytest.raises(requests.ConnectionError):
+            transport.get("tags")
+    finally:
+        transport.close()
+
+
+def test_close_aborts_a_request_waiting_for_the_server(mock_server):
+    server = mock_server(latency=5.0)
+    transport = OllamaTransport(server.api_url)
+    errors = []
+
+    def send():
+        try:
+            transport.post("chat", chat_payload())
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=send)
+    thread.start()
+    time.sleep(0.3)
+    started = time.perf_counter()
+    transport.close()
+    thread.join(2.0)
+    assert not thread.is_alive()
+    assert time.perf_counter() - started < 2.0
+    assert errors
+    with pytest.raises(TransportError):
+        transport.get("tags")